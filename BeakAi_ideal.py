@@ -2,15 +2,15 @@
 # Beak AI — Mobile (Kivy) — Professional enhanced version
 # Requirements: kivy, pillow, python-docx, python-pptx, openpyxl, fpdf, plyer
 # Use Buildozer to make .apk (android). For iOS use kivy-ios pipeline.
-import os
+import gc
 from pathlib import Path
 from functools import partial
 from io import BytesIO
 
 from kivy.app import App
 from kivy.lang import Builder
-from kivy.uix.screenmanager import ScreenManager, Screen
-from kivy.utils import get_color_from_hex
+from kivy.uix.screenmanager import ScreenManager, Screen, ScreenManagerException
+from kivy.utils import get_color_from_hex, escape_markup
 from kivy.uix.popup import Popup
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.label import Label
@@ -18,15 +18,18 @@ from kivy.uix.textinput import TextInput
 from kivy.uix.button import Button
 from kivy.metrics import dp
 from kivy.core.window import Window
-from kivy.clock import mainthread
+from kivy.clock import Clock, mainthread
+from kivy.core.image import Image as CoreImage
+from kivy.properties import StringProperty, BooleanProperty, ObjectProperty
+from kivy.uix.behaviors import ButtonBehavior
+from kivy.uix.recycleview.views import RecycleDataViewBehavior
 
-# External libs
-from PIL import Image, ImageDraw, ImageFont
-from fpdf import FPDF
-from docx import Document
-from pptx import Presentation
-from pptx.util import Inches, Pt
-from openpyxl import Workbook, load_workbook
+import beak_trace as trace
+from beak_history import History
+from beak_document import DocumentBuffer, parse_image_marker
+# beak_engine, beak_docx, beak_pdf, beak_probe and beak_library pull in pillow,
+# python-docx, python-pptx, openpyxl, fpdf and sqlite3: they are imported by
+# the screen methods that use them, never before the first frame
 
 # For file chooser on Android / mobile
 try:
@@ -54,7 +57,8 @@ BASE_DIR = get_base_dir()
 # -----------------------
 # KV UI
 # -----------------------
-KV = r'''
+# shared rules, loaded once in build()
+BASE_KV = r'''
 #:import rgba kivy.utils.get_color_from_hex
 <HeaderBar@BoxLayout>:
     size_hint_y: None
@@ -93,7 +97,11 @@ KV = r'''
         background_normal: ''
         background_color: app.small_btn_color
         color: app.btn_text_color
+'''
 
+# per-screen rules, compiled the first time the screen is built
+SCREEN_KV = {
+    'MainScreen': r'''
 <MainScreen>:
     BoxLayout:
         orientation: 'vertical'
@@ -149,6 +157,7 @@ KV = r'''
             size_hint_y: None
             height: dp(60)
             padding: dp(8)
+            spacing: dp(8)
             Button:
                 text: "🤖 Chatbot"
                 size_hint_x: 1
@@ -156,6 +165,13 @@ KV = r'''
                 background_color: app.small_btn_color
                 color: app.btn_text_color
                 on_release: root.manager.current = 'chat'
+            Button:
+                text: "📁 Fayllar"
+                size_hint_x: 1
+                background_normal: ''
+                background_color: app.small_btn_color
+                color: app.btn_text_color
+                on_release: root.manager.current = 'library'
 
         Label:
             text: "Beak AI - Bu kelajak sari ilk qadam"
@@ -163,6 +179,15 @@ KV = r'''
             height: dp(36)
             color: app.muted_color
             font_size: '12sp'
+''',
+    'ImagePDFScreen': r'''
+<FileRow>:
+    size_hint_y: None
+    height: dp(36)
+    text_size: self.size
+    valign: 'middle'
+    shorten: True
+    shorten_from: 'right'
 
 <ImagePDFScreen>:
     BoxLayout:
@@ -206,6 +231,21 @@ KV = r'''
             background_normal: ''
             background_color: app.btn_color
             color: app.btn_text_color
+''',
+    'WordScreen': r'''
+<ParagraphInput>:
+    font_name: 'Roboto'
+    font_size: '14sp'
+    size_hint_y: None
+    height: max(self.minimum_height, dp(36))
+
+<ParagraphImage>:
+    color: app.muted_color
+    size_hint_y: None
+    height: dp(36)
+    text_size: self.size
+    halign: 'left'
+    valign: 'middle'
 
 <WordScreen>:
     BoxLayout:
@@ -217,21 +257,36 @@ KV = r'''
             size_hint_y: None
             height: dp(36)
             color: app.muted_color
-        TextInput:
-            id: word_title
-            hint_text: "Sarlavha (ixtiyoriy)"
+        BoxLayout:
             size_hint_y: None
             height: dp(40)
-            font_name: 'Roboto'
-            font_size: '16sp'
-        ScrollView:
+            spacing: dp(6)
             TextInput:
-                id: word_editor
-                size_hint_y: None
-                height: dp(300)
-                text: ""
+                id: word_title
+                hint_text: "Sarlavha (ixtiyoriy)"
                 font_name: 'Roboto'
-                font_size: '14sp'
+                font_size: '16sp'
+            Button:
+                text: "Bekor"
+                size_hint_x: None
+                width: dp(72)
+                on_release: root.undo()
+            Button:
+                text: "Qaytar"
+                size_hint_x: None
+                width: dp(72)
+                on_release: root.redo()
+        RecycleView:
+            id: word_rv
+            key_viewclass: 'viewclass'
+            do_scroll_x: False
+            RecycleBoxLayout:
+                orientation: 'vertical'
+                default_size: None, dp(40)
+                default_size_hint: 1, None
+                size_hint_y: None
+                height: self.minimum_height
+                spacing: dp(2)
         BoxLayout:
             size_hint_y: None
             height: dp(56)
@@ -248,6 +303,12 @@ KV = r'''
                 background_normal: ''
                 background_color: app.small_btn_color
                 color: app.btn_text_color
+            Button:
+                text: "PDF"
+                on_release: root.export_pdf()
+                background_normal: ''
+                background_color: app.small_btn_color
+                color: app.btn_text_color
         Button:
             text: "Orqaga"
             on_release: root.manager.current = 'main'
@@ -256,7 +317,8 @@ KV = r'''
             background_normal: ''
             background_color: app.btn_color
             color: app.btn_text_color
-
+''',
+    'PPTXEditorScreen': r'''
 <PPTXEditorScreen>:
     BoxLayout:
         orientation: 'vertical'
@@ -292,6 +354,16 @@ KV = r'''
                 size_hint_x: None
                 width: dp(80)
                 on_release: root.next_slide()
+            Button:
+                text: "Bekor"
+                size_hint_x: None
+                width: dp(72)
+                on_release: root.undo()
+            Button:
+                text: "Qaytar"
+                size_hint_x: None
+                width: dp(72)
+                on_release: root.redo()
         TextInput:
             id: slide_title
             hint_text: "Slide sarlavhasi"
@@ -337,7 +409,8 @@ KV = r'''
             size_hint_y: None
             height: dp(44)
             on_release: root.manager.current = 'main'
-
+''',
+    'ExcelScreen': r'''
 <ExcelScreen>:
     BoxLayout:
         orientation: 'vertical'
@@ -371,12 +444,23 @@ KV = r'''
                 background_normal: ''
                 background_color: app.btn_color
                 color: app.btn_text_color
+            Button:
+                text: "Bekor"
+                size_hint_x: None
+                width: dp(72)
+                on_release: root.undo()
+            Button:
+                text: "Qaytar"
+                size_hint_x: None
+                width: dp(72)
+                on_release: root.redo()
         Button:
             text: "Orqaga"
             size_hint_y: None
             height: dp(44)
             on_release: root.manager.current = 'main'
-
+''',
+    'ChatScreen': r'''
 <ChatScreen>:
     BoxLayout:
         orientation: 'vertical'
@@ -406,7 +490,103 @@ KV = r'''
                 size_hint_x: None
                 width: dp(100)
                 on_release: root.send_msg(user_msg.text)
-'''
+''',
+    'LibraryScreen': r'''
+<LibraryRow>:
+    size_hint_y: None
+    height: dp(64)
+    spacing: dp(8)
+    padding: dp(4)
+    Image:
+        texture: root.texture
+        opacity: 1 if root.texture else 0
+        size_hint_x: None
+        width: dp(56)
+    Label:
+        text: root.label_text
+        markup: True
+        color: app.muted_color
+        text_size: self.size
+        halign: 'left'
+        valign: 'middle'
+
+<LibraryScreen>:
+    BoxLayout:
+        orientation: 'vertical'
+        padding: dp(8)
+        spacing: dp(6)
+        Label:
+            id: lib_status
+            text: "Oxirgi fayllar"
+            size_hint_y: None
+            height: dp(36)
+            color: app.muted_color
+        RecycleView:
+            id: lib_rv
+            viewclass: 'LibraryRow'
+            RecycleBoxLayout:
+                orientation: 'vertical'
+                default_size: None, dp(64)
+                default_size_hint: 1, None
+                size_hint_y: None
+                height: self.minimum_height
+        BoxLayout:
+            size_hint_y: None
+            height: dp(48)
+            spacing: dp(8)
+            Button:
+                text: "Yangilash"
+                on_release: root.rescan()
+            Button:
+                text: "Orqaga"
+                on_release: root.manager.current = 'main'
+''',
+    'DiagnosticsScreen': r'''
+<DiagnosticsScreen>:
+    BoxLayout:
+        orientation: 'vertical'
+        padding: dp(8)
+        spacing: dp(6)
+        Label:
+            text: "Diagnostika"
+            size_hint_y: None
+            height: dp(36)
+            color: app.muted_color
+        ScrollView:
+            Label:
+                id: diag_text
+                text: ""
+                markup: True
+                font_name: 'RobotoMono-Regular'
+                font_size: '11sp'
+                color: app.muted_color
+                size_hint_y: None
+                height: self.texture_size[1]
+                text_size: self.width, None
+                halign: 'left'
+                valign: 'top'
+        BoxLayout:
+            size_hint_y: None
+            height: dp(48)
+            spacing: dp(8)
+            Button:
+                text: "Yangilash"
+                on_release: root.refresh()
+            Button:
+                id: profile_btn
+                text: "Profil (keyingi amal)"
+                on_release: root.arm_profile()
+            Button:
+                id: jsonl_btn
+                text: "JSONL: o'chiq"
+                on_release: root.toggle_jsonl()
+        Button:
+            text: "Orqaga"
+            size_hint_y: None
+            height: dp(44)
+            on_release: root.manager.current = 'main'
+''',
+}
 
 # -----------------------
 # Utility popup
@@ -420,33 +600,168 @@ def popup(title, msg, width=0.9, height=None):
     btn.bind(on_release=p.dismiss)
     p.open()
 
+def confirm(title, msg, on_yes):
+    content = BoxLayout(orientation='vertical', padding=10, spacing=10)
+    content.add_widget(Label(text=msg))
+    row = BoxLayout(size_hint_y=None, height=dp(44), spacing=10)
+    yes, no = Button(text="Ha"), Button(text="Yo'q")
+    row.add_widget(yes)
+    row.add_widget(no)
+    content.add_widget(row)
+    p = Popup(title=title, content=content, size_hint=(0.9, None), height=dp(200))
+    no.bind(on_release=p.dismiss)
+    yes.bind(on_release=lambda *_: (p.dismiss(), on_yes()))
+    p.open()
+
+def open_file_chooser(on_selection, **kwargs):
+    # plyer filechooser; the span covers the time until the user picks files
+    token = trace.start('filechooser')
+    def _done(selection):
+        trace.finish(token, files=len(selection or []))
+        on_selection(selection)
+    try:
+        filechooser.open_file(on_selection=_done, **kwargs)
+    except Exception as e:
+        trace.finish(token, error=e)
+        raise
+
+# -----------------------
+# Lazy screen manager
+# -----------------------
+def _kv_filename(rule_name):
+    return f"beak_{rule_name}.kv"
+
+def new_history(apply):
+    # one undo/redo log per editor, sized by the app-wide budget
+    return History(apply, budget=BeakAIApp.HISTORY_BUDGET)
+
+class LazyScreenManager(ScreenManager):
+    # screens are registered as factories (name -> Screen subclass) and only
+    # built the first time they are needed; inactive ones can be dropped again
+    # with unload_inactive() when memory gets tight.
+    def __init__(self, factories, aliases=None, **kwargs):
+        self._factories = dict(factories)
+        self._aliases = dict(aliases or {})
+        self._saved_state = {}
+        self._loaded_kv = set()
+        super().__init__(**kwargs)
+
+    def resolve(self, name):
+        return self._aliases.get(name, name)
+
+    def _load_kv(self, cls):
+        rule = cls.__name__
+        if rule in self._loaded_kv or rule not in SCREEN_KV:
+            return
+        Builder.load_string(SCREEN_KV[rule], filename=_kv_filename(rule))
+        self._loaded_kv.add(rule)
+
+    def _unload_kv(self, cls):
+        rule = cls.__name__
+        if rule not in self._loaded_kv:
+            return
+        # keep the rules while another registered name still uses this class
+        if any(type(s) is cls for s in self.screens):
+            return
+        Builder.unload_file(_kv_filename(rule))
+        self._loaded_kv.discard(rule)
+
+    def ensure_screen(self, name):
+        name = self.resolve(name)
+        for s in self.screens:
+            if s.name == name:
+                return s
+        cls = self._factories.get(name)
+        if cls is None:
+            raise ScreenManagerException('No Screen with name "%s".' % name)
+        self._load_kv(cls)
+        screen = cls(name=name)
+        state = self._saved_state.pop(name, None)
+        if state is not None and hasattr(screen, 'restore_state'):
+            screen.restore_state(state)
+        self.add_widget(screen)
+        return screen
+
+    def get_screen(self, name):
+        return self.ensure_screen(name)
+
+    def has_screen(self, name):
+        return self.resolve(name) in self._factories or super().has_screen(name)
+
+    def on_current(self, instance, value):
+        if value is not None:
+            name = self.resolve(value)
+            if name != value:
+                self.current = name
+                return
+            self.ensure_screen(name)
+        super().on_current(instance, value)
+
+    def unload_inactive(self, keep=('main',)):
+        if self.transition.is_active:
+            return 0
+        dropped = 0
+        for screen in list(self.screens):
+            if screen is self.current_screen or screen.name in keep:
+                continue
+            if hasattr(screen, 'dump_state'):
+                self._saved_state[screen.name] = screen.dump_state()
+            self.remove_widget(screen)
+            self._unload_kv(type(screen))
+            dropped += 1
+        if dropped:
+            gc.collect()
+        return dropped
+
 # -----------------------
 # Screens Implementation
 # -----------------------
 class MainScreen(Screen):
     pass
 
+class FileRow(Label):
+    # one chosen file; long names and errors are cut to the row width
+    pass
+
 class ImagePDFScreen(Screen):
-    # holds selected files list in self.selected_files
+    # holds selected files list in self.selected_files; self.selection probes
+    # them and decodes the first pages ahead of create_pdf
+    PREFETCH_PAGES = 8  # ~6 MiB of decoded RGB each
+
+    selection = None
+
     def on_enter(self):
+        self._set_selection(None)
         self.selected_files = []
         self.populate_grid()
 
+    def _set_selection(self, selection):
+        if self.selection is not None:
+            self.selection.cancel()  # drops pages decoded for the old choice
+        self.selection = selection
+
     def populate_grid(self):
         grid = self.ids.file_grid
         grid.clear_widgets()
+        app = App.get_running_app()
         if not hasattr(self, 'selected_files') or not self.selected_files:
-            grid.add_widget(Label(text="Hali rasm tanlanmadi", size_hint_y=None, height=dp(40), color=App.get_running_app().muted_color))
-        else:
-            for p in self.selected_files:
-                grid.add_widget(Label(text=str(Path(p).name), size_hint_y=None, height=dp(36), color=App.get_running_app().muted_color))
+            grid.add_widget(Label(text="Hali rasm tanlanmadi", size_hint_y=None, height=dp(40), color=app.muted_color))
+            return
+        for p in self.selected_files:
+            text, color = str(Path(p).name), app.muted_color
+            info = self.selection.info(p) if self.selection else None
+            if info is not None and info['ok']:
+                text += f"  {info['width']}x{info['height']} {info['format'].upper()}"
+            elif info is not None:
+                text, color = f"{text}  (xato: {info['error']})", app.error_color
+            grid.add_widget(FileRow(text=text, color=color))
 
     def open_gallery(self):
         # Try plyer.filechooser (works on Android)
         if filechooser:
             try:
                 # allow multiple
-                filechooser.open_file(on_selection=self._on_files_selected, multiple=True, filters=['*.png','*.jpg','*.jpeg','*.webp','*.bmp'])
+                open_file_chooser(self._on_files_selected, multiple=True, filters=['*.png','*.jpg','*.jpeg','*.webp','*.bmp'])
                 return
             except Exception:
                 pass
@@ -455,14 +770,29 @@ class ImagePDFScreen(Screen):
 
     @mainthread
     def _on_files_selected(self, selection):
+        from beak_probe import Selection
+        import beak_engine as engine
         if not selection:
             return
         # limit to 100
         sel = selection[:100]
+        # probe headers and decode the first pages off the UI thread
+        self._set_selection(Selection(sel, 'image', prefetch=engine.load_page, limit=self.PREFETCH_PAGES))
+        self.selection.when_probed(self._on_probed)
         self.selected_files = sel
         self.populate_grid()
 
+    @mainthread
+    def _on_probed(self, selection, infos):
+        if selection is not self.selection:
+            return  # replaced by a newer choice
+        self.populate_grid()
+        bad = [Path(i['path']).name for i in infos if not i['ok']]
+        if bad:
+            popup("Diqqat", f"{len(bad)} ta rasm ochilmadi va PDFga qo'shilmaydi:\n" + "\n".join(bad[:5]))
+
     def create_pdf(self):
+        import beak_engine as engine
         files = getattr(self, 'selected_files', [])
         if not files:
             popup("Diqqat", "Iltimos, kamida bitta rasm tanlang.")
@@ -470,75 +800,239 @@ class ImagePDFScreen(Screen):
         if len(files) > 100:
             popup("Diqqat", "Maksimal 100 ta rasm qabul qilinadi.")
             files = files[:100]
+        load = None
+        if self.selection is not None:
+            # files flagged by the probe are left out; prefetched pages are reused
+            files = [p for p in files if self.selection.ok(p)]
+            if not files:
+                popup("Diqqat", "Tanlangan rasmlarning hech biri ochilmadi.")
+                return
+            load = partial(self.selection.result, fallback=engine.load_page)
         save_path = BASE_DIR / "PDFs" / f"images_to_pdf_{len(files)}.pdf"
         try:
-            pil_images = []
-            for p in files:
-                img = Image.open(p).convert("RGB")
-                max_w, max_h = 1240, 1754
-                img.thumbnail((max_w, max_h), Image.LANCZOS)
-                pil_images.append(img)
-            pil_images[0].save(str(save_path), save_all=True, append_images=pil_images[1:], quality=95)
+            with trace.operation('create_pdf', files=len(files)):
+                engine.images_to_pdf(files, save_path, load=load)
             popup("✅", f"PDF yaratildi:\n{save_path}")
         except Exception as e:
             popup("Xatolik", str(e))
 
+class ParagraphInput(RecycleDataViewBehavior, TextInput):
+    # one visible paragraph of the Word editor; views are recycled while scrolling
+    index = None
+    _syncing = False
+
+    def refresh_view_attrs(self, rv, index, data):
+        self.index = index
+        self.editor = App.get_running_app().sm.get_screen('word')
+        self._syncing = True
+        try:
+            return super().refresh_view_attrs(rv, index, data)
+        finally:
+            self._syncing = False
+
+    def on_text(self, instance, value):
+        if not self._syncing and self.index is not None:
+            self.editor.paragraph_edited(self.index, value)
+
+    def keyboard_on_key_down(self, window, keycode, text, modifiers):
+        if (keycode[1] == 'backspace' and self.index and not self.selection_text
+                and self.cursor_index() == 0):
+            self.editor.merge_paragraph(self.index)
+            return True
+        return super().keyboard_on_key_down(window, keycode, text, modifiers)
+
+class ParagraphImage(RecycleDataViewBehavior, Label):
+    pass
+
 class WordScreen(Screen):
+    # the document lives in self.buffer (a DocumentBuffer); the RecycleView only
+    # creates widgets for the paragraphs on screen
+    def __init__(self, **kwargs):
+        from beak_docx import DocxWriter
+        super().__init__(**kwargs)
+        self.buffer = DocumentBuffer()
+        self.docx_writer = DocxWriter()
+        self.history = new_history(self._apply_history)
+        self._sync_from(0)
+        self._mark_clean()
+
     def on_enter(self):
         # ensure defaults
         self.last_added_image = None
+
+    def _mark_clean(self):
+        # content as last loaded or saved to .docx
+        self._clean = (self.buffer.version, self.ids.word_title.text)
+
+    def is_modified(self):
+        if (self.buffer.version, self.ids.word_title.text) == self._clean:
+            return False
+        return bool(self.ids.word_title.text.strip() or self.buffer.text().strip())
+
+    def dump_state(self):
+        return {'title': self.ids.word_title.text, 'text': self.buffer.text(),
+                'modified': self.is_modified()}
+
+    def restore_state(self, state):
+        self.ids.word_title.text = state.get('title', '')
+        self.buffer.set_text(state.get('text', ''))
+        self.history.clear()
+        self._sync_from(0)
+        if state.get('modified'):
+            self._clean = None  # unloaded with unsaved edits
+        else:
+            self._mark_clean()
+
+    def _item(self, text):
+        img = parse_image_marker(text)
+        if img is not None:
+            return {'viewclass': 'ParagraphImage', 'text': f"🖼 {Path(img).name}"}
+        return {'viewclass': 'ParagraphInput', 'text': text}
+
+    def _sync_from(self, index):
+        # rebuild view data for paragraphs index.. (appends and loads only)
+        data = self.ids.word_rv.data
+        items = [self._item(p) for p in self.buffer.texts(index)]
+        if index == 0:
+            self.ids.word_rv.data = items
+            return
+        del data[index:]
+        data.extend(items)
+
+    def _focus(self, index, col=0):
+        rv = self.ids.word_rv
+        rv.refresh_views()
+        view = rv.view_adapter.get_visible_view(index)
+        if isinstance(view, TextInput):
+            view.focus = True
+            view.cursor = view.get_cursor_from_index(col)
+
+    def _record(self, index, old, new, key=None):
+        # edits are kept as splices of the paragraphs that changed
+        self.history.record(('splice', index, len(new), old), ('splice', index, len(old), new), key=key)
+
+    def _apply_history(self, op):
+        _, index, count, texts = op
+        self.buffer.splice(index, count, texts)
+        data = self.ids.word_rv.data
+        if len(data) - count + len(texts) != len(self.buffer):
+            self._sync_from(0)  # the buffer never goes empty
+        else:
+            # RecycleView data only takes same-length slice updates
+            common = min(count, len(texts))
+            for k in range(common):
+                data[index + k] = self._item(texts[k])
+            if count > common:
+                del data[index + common:index + count]
+            for k in range(common, len(texts)):
+                data.insert(index + k, self._item(texts[k]))
+        target = max(0, index + len(texts) - 1)
+        self._focus(target, len(self.buffer[target]))
+
+    def undo(self):
+        self.history.undo()
+
+    def redo(self):
+        self.history.redo()
+
+    def paragraph_edited(self, index, text):
+        data = self.ids.word_rv.data
+        old = self.buffer[index]
+        if "\n" not in text:
+            # plain typing: only this paragraph changes and its view is left alone
+            if text != old:
+                self.buffer.replace(index, text)
+                data[index]['text'] = text
+                self._record(index, [old], [text], key=('para', index))
+            return
+        # Enter: split into several paragraphs
+        count = self.buffer.replace(index, text)
+        data[index] = self._item(self.buffer[index])
+        for i in range(1, count):
+            data.insert(index + i, self._item(self.buffer[index + i]))
+        self._record(index, [old], [self.buffer[index + i] for i in range(count)])
+        self._focus(index + count - 1)
+
+    def merge_paragraph(self, index):
+        data = self.ids.word_rv.data
+        if self.buffer.is_image(index - 1):
+            # backspace after a picture removes the picture
+            self._record(index - 1, [self.buffer[index - 1]], [])
+            self.buffer.delete(index - 1)
+            del data[index - 1]
+            self._focus(index - 1)
+            return
+        old = [self.buffer[index - 1], self.buffer[index]]
+        col = self.buffer.merge_with_previous(index)
+        del data[index]
+        data[index - 1] = self._item(self.buffer[index - 1])
+        self._record(index - 1, old, [self.buffer[index - 1]])
+        self._focus(index - 1, col)
+
     def add_image_to_doc(self):
         if filechooser:
-            filechooser.open_file(on_selection=self._add_image_selected)
+            open_file_chooser(self._add_image_selected)
         else:
             popup("Diqqat", "Filechooser mavjud emas. Plyer filechooser ni buildozer spec ga qo‘shing.")
 
     @mainthread
     def _add_image_selected(self, selection):
+        from beak_probe import Selection
         if not selection:
             return
-        img_path = selection[0]
-        # Insert marker into editor at end or store as list
-        self.ids.word_editor.text += f"\n[IMAGE:{img_path}]\n"
+        # the header is checked on a worker before the picture is inserted
+        Selection(selection[:1], 'image').when_probed(self._insert_image)
+
+    @mainthread
+    def _insert_image(self, selection, infos):
+        import beak_probe
+        info = infos[0]
+        if not info['ok']:
+            popup("Xatolik", f"Rasm ochilmadi:\n{info['error']}")
+            return
+        img_path = info['path']
+        # resampled for the .docx in the background, ready for the next save
+        self.docx_writer.warm(img_path, beak_probe.pool())
+        # marker paragraph goes at the end; nothing else is copied or re-laid out
+        before = len(self.buffer)
+        index = self.buffer.append_image(img_path)
+        self._record(index, [""] if index < before else [], self.buffer.texts(index))
+        self._sync_from(index)
         popup("✅", f"Rasm marker qo'shildi:\n{img_path}")
 
     def save_docx(self):
         title = self.ids.word_title.text.strip()
-        content = self.ids.word_editor.text
         path = BASE_DIR / "Documents" / "beak_doc.docx"
         try:
-            doc = Document()
-            # set default style font
-            style = doc.styles['Normal']
-            style.font.name = 'Times New Roman'
-            style.font.size = Pt(14)
-            if title:
-                doc.add_heading(title, level=1)
-            lines = content.splitlines()
-            for line in lines:
-                line = line.strip()
-                if line.startswith("[IMAGE:") and line.endswith("]"):
-                    img_path = line[7:-1]
-                    if os.path.exists(img_path):
-                        try:
-                            doc.add_picture(img_path, width=Inches(5))
-                        except Exception:
-                            doc.add_paragraph("[Rasm qo'shishda xatolik]")
-                    else:
-                        doc.add_paragraph("[Rasm topilmadi]")
-                else:
-                    p = doc.add_paragraph(line)
-                    p.style = doc.styles['Normal']
-            doc.save(str(path))
+            with trace.operation('save_docx', paragraphs=len(self.buffer)):
+                self.docx_writer.save(self.buffer, title, path)
+            self._mark_clean()
             popup("✅", f".docx saqlandi:\n{path}")
         except Exception as e:
             popup("Xatolik", str(e))
 
+    def export_pdf(self):
+        import beak_pdf
+        title = self.ids.word_title.text.strip()
+        path = BASE_DIR / "PDFs" / "beak_doc.pdf"
+        try:
+            with trace.operation('export_word_pdf', paragraphs=len(self.buffer)):
+                beak_pdf.configure(cache_dir=BASE_DIR / "Temp" / "fonts")
+                beak_pdf.document_to_pdf(self.buffer, title, path)
+            popup("✅", f"PDF saqlandi:\n{path}")
+        except Exception as e:
+            popup("Xatolik", str(e))
+
 class PPTXEditorScreen(Screen):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.history = new_history(self._apply_history)
+
     def on_enter(self):
+        import beak_engine as engine
         # default slides structure: list of dict {title,text,images:list,font_size:int,bg_color:hex}
         if not hasattr(self, 'slides'):
-            self.slides = [{'title':'','text':'','images':[],'font_size':20,'bg_color':'#ffffff'}]
+            self.slides = [engine.new_slide()]
             self.current = 0
         self.update_ui()
 
@@ -546,6 +1040,48 @@ class PPTXEditorScreen(Screen):
         return "Presentation Editor"
     header_text = property(lambda self: "Presentation Editor")
 
+    def dump_state(self):
+        if not hasattr(self, 'slides'):
+            return None
+        return {'slides': self.slides, 'current': self.current}
+
+    def restore_state(self, state):
+        self.slides = state['slides']
+        self.current = state['current']
+        self.history.clear()
+
+    def new_deck(self, count):
+        import beak_engine as engine
+        self.slides = [engine.new_slide() for _ in range(count)]
+        self.current = 0
+        self.history.clear()
+        self.update_ui()
+
+    def _apply_history(self, op):
+        # ('field', slide, name, value) | ('image_insert', slide, pos, path) | ('image_delete', slide, pos)
+        kind, i = op[0], op[1]
+        slide = self.slides[i]
+        if kind == 'field':
+            slide[op[2]] = op[3]
+        elif kind == 'image_insert':
+            slide['images'].insert(op[2], op[3])
+        elif kind == 'image_delete':
+            del slide['images'][op[2]]
+        self.current = i
+        self.update_ui()
+
+    def _set_field(self, name, value, default=None):
+        slide = self.slides[self.current]
+        old = slide.get(name, default)
+        slide[name] = value
+        self.history.record(('field', self.current, name, old), ('field', self.current, name, value))
+
+    def undo(self):
+        self.history.undo()
+
+    def redo(self):
+        self.history.redo()
+
     def update_ui(self):
         s = self.slides[self.current]
         self.ids.slide_index.text = str(self.current+1)
@@ -566,14 +1102,26 @@ class PPTXEditorScreen(Screen):
         if not filechooser:
             popup("Diqqat", "Filechooser mavjud emas. Plyer filechooser ni buildozer spec ga qo‘shing.")
             return
-        filechooser.open_file(on_selection=self._on_image_selected)
+        open_file_chooser(self._on_image_selected)
 
     @mainthread
     def _on_image_selected(self, selection):
+        from beak_probe import Selection
         if not selection:
             return
-        img = selection[0]
-        self.slides[self.current]['images'].append(img)
+        Selection(selection[:1], 'image').when_probed(self._insert_image)
+
+    @mainthread
+    def _insert_image(self, selection, infos):
+        info = infos[0]
+        if not info['ok']:
+            popup("Xatolik", f"Rasm ochilmadi:\n{info['error']}")
+            return
+        img = info['path']
+        images = self.slides[self.current]['images']
+        images.append(img)
+        pos = len(images) - 1
+        self.history.record(('image_delete', self.current, pos), ('image_insert', self.current, pos, img))
         popup("✅", f"Rasm qo'shildi:\n{img}")
 
     def change_bg_color(self):
@@ -581,7 +1129,7 @@ class PPTXEditorScreen(Screen):
         def on_ok(instance):
             val = ti.text.strip()
             if val:
-                self.slides[self.current]['bg_color'] = val
+                self._set_field('bg_color', val, '#ffffff')
                 popup("✅", "Fon rangi o'zgardi")
             popup_inst.dismiss()
 
@@ -600,7 +1148,7 @@ class PPTXEditorScreen(Screen):
             try:
                 val = int(ti.text)
                 if 8 <= val <= 72:
-                    self.slides[self.current]['font_size'] = val
+                    self._set_field('font_size', val, 20)
                     popup("✅", "Shrift o'lchami o'zgardi")
                 else:
                     popup("Xatolik", "8 dan 72 gacha son kiriting")
@@ -619,94 +1167,43 @@ class PPTXEditorScreen(Screen):
         popup_inst.open()
 
     def export_pdf(self):
+        import beak_engine as engine
         # render slides as images and generate pdf
         try:
-            images = []
-            for i,s in enumerate(self.slides):
-                # create PIL image for slide
-                W,H = 1240, 700
-                bg = s.get('bg_color','#ffffff')
-                img = Image.new('RGB', (W,H), bg)
-                draw = ImageDraw.Draw(img)
-                # text
-                title = s.get('title','')
-                body = s.get('text','')
-                # default font (may not match on mobile)
-                try:
-                    f_title = ImageFont.truetype("arial.ttf", 36)
-                    f_body = ImageFont.truetype("arial.ttf", s.get('font_size',20))
-                except:
-                    f_title = ImageFont.load_default()
-                    f_body = ImageFont.load_default()
-                draw.text((40,40), title, font=f_title, fill=(0,0,0))
-                draw.text((40,120), body, font=f_body, fill=(0,0,0))
-                # paste images (first one if exists)
-                imgs = s.get('images',[])
-                y = 200
-                for ipath in imgs[:3]:
-                    try:
-                        im = Image.open(ipath)
-                        im.thumbnail((W-100, 300), Image.LANCZOS)
-                        img.paste(im, (40,y))
-                        y += im.size[1] + 20
-                    except:
-                        pass
-                images.append(img)
             save_path = BASE_DIR / "PDFs" / "presentation_export.pdf"
-            images[0].save(str(save_path), save_all=True, append_images=images[1:], quality=90)
+            with trace.operation('export_pdf', slides=len(self.slides)):
+                engine.slides_to_pdf(self.slides, save_path)
             popup("✅", f"PDF eksport qilindi:\n{save_path}")
         except Exception as e:
             popup("Xatolik", str(e))
 
     def export_pptx(self):
+        import beak_engine as engine
         try:
-            prs = Presentation()
-            for s in self.slides:
-                layout = prs.slide_layouts[6]  # blank
-                slide = prs.slides.add_slide(layout)
-                # bg color
-                bg_color = s.get('bg_color','#FFFFFF').lstrip('#')
-                try:
-                    r = int(bg_color[0:2],16)/255.0
-                    g = int(bg_color[2:4],16)/255.0
-                    b = int(bg_color[4:6],16)/255.0
-                    slide.background.fill.solid()
-                    slide.background.fill.fore_color.rgb = (int(r*255),int(g*255),int(b*255))
-                except:
-                    pass
-                # add title
-                if s.get('title'):
-                    txBox = slide.shapes.add_textbox(Inches(0.5), Inches(0.3), Inches(9), Inches(1))
-                    tf = txBox.text_frame
-                    p = tf.paragraphs[0]
-                    run = p.add_run()
-                    run.text = s.get('title','')
-                    run.font.size = Pt(28)
-                if s.get('text'):
-                    txBox = slide.shapes.add_textbox(Inches(0.5), Inches(1.2), Inches(9), Inches(4))
-                    tf = txBox.text_frame
-                    p = tf.paragraphs[0]
-                    run = p.add_run()
-                    run.text = s.get('text','')
-                    run.font.size = Pt(s.get('font_size',20))
-                # add images
-                for ipath in s.get('images',[])[:3]:
-                    try:
-                        slide.shapes.add_picture(str(ipath), Inches(0.5), Inches(3.5), width=Inches(5))
-                    except:
-                        pass
             save_path = BASE_DIR / "Presentations" / "presentation_export.pptx"
-            prs.save(str(save_path))
+            with trace.operation('export_pptx', slides=len(self.slides)):
+                engine.slides_to_pptx(self.slides, save_path)
             popup("✅", f"PPTX eksport qilindi:\n{save_path}")
         except Exception as e:
             popup("Xatolik", str(e))
 
 class ExcelScreen(Screen):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.history = new_history(self._apply_history)
+        self._values = {}
+
+    def open_path(self, path):
+        # loaded once the grid exists (on_enter rebuilds it)
+        self._pending_path = path
+
     def on_enter(self):
         # build a 10x10 grid of TextInput to simulate excel
         grid = self.ids.excel_grid
         grid.clear_widgets()
         self.cells = {}
+        self._values = {}
+        self.history.clear()
         rows, cols = 10, 10
         # header row A..J
         for c in range(cols):
@@ -716,42 +1213,38 @@ class ExcelScreen(Screen):
             for c in range(cols):
                 ti = TextInput(multiline=False, size_hint_y=None, height=dp(36))
                 key = f"{chr(65+c)}{r+1}"
+                ti.bind(text=partial(self._cell_edited, key))
                 self.cells[key] = ti
                 grid.add_widget(ti)
+        pending = self.__dict__.pop('_pending_path', None)
+        if pending:
+            self._on_xlsx_selected([pending])
+
+    def _cell_edited(self, key, ti, value):
+        # only the changed cell is logged; typing in one cell coalesces
+        old = self._values.get(key, "")
+        if value == old:
+            return
+        self._values[key] = value
+        self.history.record(('cell', key, old), ('cell', key, value), key=('cell', key))
+
+    def _apply_history(self, op):
+        _, key, value = op
+        self._values[key] = value
+        self.cells[key].text = value
+
+    def undo(self):
+        self.history.undo()
+
+    def redo(self):
+        self.history.redo()
 
     def save_xlsx(self):
+        import beak_engine as engine
         try:
             path = BASE_DIR / "Excels" / "beak_excel.xlsx"
-            wb = Workbook()
-            ws = wb.active
-            for key, widget in self.cells.items():
-                col = ord(key[0]) - 65 + 1
-                row = int(key[1:])
-                val = widget.text.strip()
-                # simple formula handling: =SUM(A1:B2)
-                if val.startswith('=SUM(') and val.endswith(')'):
-                    rng = val[5:-1]
-                    total = 0
-                    try:
-                        a,b = rng.split(':')
-                        col1 = ord(a[0])-65
-                        row1 = int(a[1:]) - 1
-                        col2 = ord(b[0])-65
-                        row2 = int(b[1:]) - 1
-                        for rr in range(row1, row2+1):
-                            for cc in range(col1, col2+1):
-                                k = f"{chr(65+cc)}{rr+1}"
-                                v = self.cells[k].text.strip()
-                                try:
-                                    total += float(v)
-                                except:
-                                    pass
-                    except:
-                        total = 0
-                    ws.cell(row=row, column=col, value=total)
-                else:
-                    ws.cell(row=row, column=col, value=val)
-            wb.save(str(path))
+            with trace.operation('save_xlsx'):
+                engine.cells_to_xlsx({key: widget.text for key, widget in self.cells.items()}, path)
             popup("✅", f"Excel saqlandi:\n{path}")
         except Exception as e:
             popup("Xatolik", str(e))
@@ -760,29 +1253,33 @@ class ExcelScreen(Screen):
         if not filechooser:
             popup("Diqqat", "Filechooser mavjud emas.")
             return
-        filechooser.open_file(on_selection=self._on_xlsx_selected)
+        open_file_chooser(self._on_xlsx_selected)
 
     @mainthread
     def _on_xlsx_selected(self, selection):
+        from beak_probe import Selection
         if not selection:
             return
         p = selection[0]
-        try:
-            wb = load_workbook(p)
-            ws = wb.active
-            for r in ws.iter_rows(min_row=1, max_row=10, min_col=1, max_col=10, values_only=True):
-                for c_idx, v in enumerate(r):
-                    key = f"{chr(65+c_idx)}{r[0] and 1 or 1}"  # not used
-            # simple: just reload into cells if sizes match
-            for r_idx in range(1,11):
-                for c_idx in range(1,11):
-                    k = f"{chr(64+c_idx)}{r_idx}"
-                    val = ws.cell(row=r_idx, column=c_idx).value
-                    if k in self.cells:
-                        self.cells[k].text = "" if val is None else str(val)
-            popup("✅", "Excel yuklandi")
-        except Exception as e:
-            popup("Xatolik", str(e))
+        # probed and read on a worker; the grid is filled back here
+        sel = Selection([p], 'xlsx', prefetch=self._read_xlsx)
+        sel.when_done(p, self._on_xlsx_loaded)
+
+    def _read_xlsx(self, path):
+        # runs on the worker, so an armed profile captures the read itself
+        import beak_engine as engine
+        with trace.operation('load_xlsx'):
+            return engine.read_xlsx(path, rows=10, cols=10)
+
+    @mainthread
+    def _on_xlsx_loaded(self, values, error):
+        if error is not None:
+            popup("Xatolik", str(error))
+            return
+        with self.history.group('load_xlsx'):
+            for k, ti in self.cells.items():
+                ti.text = values.get(k, "")
+        popup("✅", "Excel yuklandi")
 
 class ChatScreen(Screen):
     def send_msg(self, text):
@@ -807,6 +1304,107 @@ class ChatScreen(Screen):
             return "Word bo'limida rasm qo'shish va saqlash mumkin."
         return "Kechirasiz, men hozirgina offline yordamchiman. Men menyudan ishlashni maslahat beraman."
 
+class LibraryRow(RecycleDataViewBehavior, ButtonBehavior, BoxLayout):
+    path = StringProperty('')
+    kind = StringProperty('')
+    label_text = StringProperty('')
+    has_thumb = BooleanProperty(False)
+    texture = ObjectProperty(None, allownone=True)
+
+    def refresh_view_attrs(self, rv, index, data):
+        screen = App.get_running_app().sm.get_screen('library')
+        self.texture = screen.thumb_texture(data['path'], data['mtime']) if data.get('has_thumb') else None
+        return super().refresh_view_attrs(rv, index, data)
+
+    def on_release(self):
+        App.get_running_app().open_library_file(self.path, self.kind)
+
+class LibraryScreen(Screen):
+    # recent outputs under BASE_DIR, read from the SQLite index
+    THUMB_CACHE = 200
+
+    def on_enter(self):
+        self._thumbs = getattr(self, '_thumbs', {})
+        self.refresh()
+        self.rescan()
+
+    def rescan(self):
+        app = App.get_running_app()
+        if app.library.rescan_async(on_done=self._on_scanned):
+            self.ids.lib_status.text = "Oxirgi fayllar (yangilanmoqda...)"
+
+    @mainthread
+    def _on_scanned(self, result):
+        if self.manager and self.manager.current == self.name:
+            self.refresh()
+
+    def refresh(self):
+        rows = App.get_running_app().library.recent(limit=1000)
+        data = []
+        for r in rows:
+            meta = [r['kind'].upper(), f"{r['size'] / 1024:.0f} KB"]
+            if r['pages']:
+                meta.append(f"{r['pages']} sahifa")
+            data.append({
+                'path': r['path'],
+                'kind': r['kind'],
+                'mtime': r['mtime'],
+                'has_thumb': r['has_thumb'],
+                'label_text': f"[b]{escape_markup(Path(r['path']).name)}[/b]\n{' · '.join(meta)}",
+            })
+        # the app re-exports to fixed names: a changed mtime means a new thumbnail
+        current = {(r['path'], r['mtime']) for r in rows}
+        for key in [k for k in self._thumbs if k not in current]:
+            del self._thumbs[key]
+        self.ids.lib_rv.data = data
+        self.ids.lib_status.text = f"Oxirgi fayllar ({len(data)})"
+
+    def thumb_texture(self, path, mtime):
+        cache = self._thumbs
+        key = (path, mtime)
+        if key in cache:
+            return cache[key]
+        png = App.get_running_app().library.thumbnail(path)
+        tex = CoreImage(BytesIO(png), ext='png').texture if png else None
+        if len(cache) >= self.THUMB_CACHE:
+            cache.pop(next(iter(cache)))
+        cache[key] = tex
+        return tex
+
+class DiagnosticsScreen(Screen):
+    # recent spans and per-stage percentiles from beak_trace
+    def on_enter(self):
+        self.refresh()
+
+    def refresh(self):
+        lines = ["[b]Bosqich            soni   p50 ms   p90 ms   p99 ms   max ms  xato[/b]"]
+        for name, st in sorted(trace.stage_stats().items()):
+            lines.append(f"{escape_markup(name[:18].ljust(18))} {st['count']:6d} {st['p50']:8.1f} {st['p90']:8.1f} "
+                         f"{st['p99']:8.1f} {st['max']:8.1f} {st['errors']:5d}")
+        lines.append("")
+        lines.append("[b]Oxirgi amallar[/b]")
+        for e in trace.recent(60):
+            # names and errors carry paths and messages: never markup
+            err = f"  [color=ff6666]{escape_markup(e['error'])}[/color]" if 'error' in e else ""
+            lines.append(f"{escape_markup(e['name'][:18].ljust(18))} {e['dur_ms']:9.1f} ms  "
+                         f"{escape_markup(e.get('parent') or '')}{err}")
+        self.ids.diag_text.text = "\n".join(lines)
+        self.ids.profile_btn.text = "Profil: kutilmoqda" if trace.profile_armed() else "Profil (keyingi amal)"
+        self.ids.jsonl_btn.text = "JSONL: yoqiq" if trace.flush_path() else "JSONL: o'chiq"
+
+    def arm_profile(self):
+        trace.arm_profile()
+        self.refresh()
+        popup("Profil", f"Keyingi eksport cProfile bilan yoziladi:\n{BASE_DIR / 'Temp'}")
+
+    def toggle_jsonl(self):
+        if trace.flush_path():
+            trace.flush()
+            trace.configure(flush_path=None)
+        else:
+            trace.configure(flush_path=BASE_DIR / "Temp" / "trace.jsonl")
+        self.refresh()
+
 # -----------------------
 # App
 # -----------------------
@@ -818,21 +1416,81 @@ class BeakAIApp(App):
     small_btn_color = list(get_color_from_hex("#2a4aa0"))
     btn_text_color = (1, 1, 1, 1)
     muted_color = list(get_color_from_hex("#9fb1ff"))
+    error_color = list(get_color_from_hex("#ff7a7a"))
+
+    # name -> Screen class; built on first navigation by LazyScreenManager
+    screen_factories = {
+        'main': MainScreen,
+        'image_pdf': ImagePDFScreen,
+        'word': WordScreen,
+        'pptx': PPTXEditorScreen,
+        'excel': ExcelScreen,
+        'chat': ChatScreen,
+        'diagnostics': DiagnosticsScreen,
+        'library': LibraryScreen,
+    }
+    screen_aliases = {'pptx_editor': 'pptx'}
 
     def build(self):
-        self.sm = ScreenManager()
-        Builder.load_string(KV)
-        self.sm.add_widget(MainScreen(name='main'))
-        self.sm.add_widget(ImagePDFScreen(name='image_pdf'))
-        self.sm.add_widget(WordScreen(name='word'))
-        self.sm.add_widget(PPTXEditorScreen(name='pptx_editor'))
-        self.sm.add_widget(PPTXEditorScreen(name='pptx'))
-        self.sm.add_widget(ExcelScreen(name='excel'))
-        self.sm.add_widget(ChatScreen(name='chat'))
+        trace.configure(profile_dir=BASE_DIR / "Temp")
+        Builder.load_string(BASE_KV)
+        self.sm = LazyScreenManager(self.screen_factories, self.screen_aliases)
+        # only the main screen is built before the first frame
+        self.sm.current = 'main'
+        Window.bind(on_memorywarning=self.on_memorywarning)
         return self.sm
 
+    LIBRARY_RESCAN_INTERVAL = 300  # seconds
+    HISTORY_BUDGET = 2 * 2**20     # bytes of undo history per editor
+
+    _library = None
+
+    @property
+    def library(self):
+        # the SQLite index is opened on first use
+        if self._library is None:
+            from beak_library import Library
+            self._library = Library(BASE_DIR)
+        return self._library
+
     def on_start(self):
-        pass
+        # first scan once the main screen is up, then kept fresh in the background
+        Clock.schedule_once(lambda dt: self.library.rescan_async(), 1)
+        Clock.schedule_interval(lambda dt: self.library.rescan_async(), self.LIBRARY_RESCAN_INTERVAL)
+
+    def open_library_file(self, path, kind):
+        try:
+            if kind == 'docx':
+                word = self.sm.get_screen('word')
+                if word.is_modified():
+                    confirm("Diqqat", "Saqlanmagan matn o'chadi. Davom etilsinmi?",
+                            partial(self._open_docx, path))
+                else:
+                    self._open_docx(path)
+            elif kind == 'xlsx':
+                self.sm.get_screen('excel').open_path(path)
+                self.sm.current = 'excel'
+            else:
+                popup("Fayl", str(path))
+        except Exception as e:
+            popup("Xatolik", str(e))
+
+    def _open_docx(self, path):
+        import beak_engine as engine
+        try:
+            # pictures are copied out of the document so the editor can keep them
+            title, text = engine.docx_to_text(path, BASE_DIR / "Temp" / "media")
+        except Exception as e:
+            popup("Xatolik", str(e))
+            return
+        self.sm.get_screen('word').restore_state({'title': title, 'text': text})
+        self.sm.current = 'word'
+
+    def on_stop(self):
+        trace.flush()
+
+    def on_memorywarning(self, *args):
+        self.sm.unload_inactive()
 
     def open_image_pdf_picker(self):
         # go to screen and auto open gallery
@@ -841,7 +1499,7 @@ class BeakAIApp(App):
         # if plyer available open gallery directly
         if filechooser:
             try:
-                filechooser.open_file(on_selection=screen._on_files_selected, multiple=True, filters=['*.png','*.jpg','*.jpeg','*.bmp','*.webp'])
+                open_file_chooser(screen._on_files_selected, multiple=True, filters=['*.png','*.jpg','*.jpeg','*.bmp','*.webp'])
                 return
             except Exception:
                 pass
@@ -878,9 +1536,7 @@ class BeakAIApp(App):
             popup2.dismiss()
             # create editor screen with cnt slides
             screen = self.sm.get_screen('pptx')
-            screen.slides = [{'title':'','text':'','images':[],'font_size':20,'bg_color':'#ffffff'} for _ in range(cnt)]
-            screen.current = 0
-            screen.update_ui()
+            screen.new_deck(cnt)
             self.sm.current = 'pptx'
         content = BoxLayout(orientation='vertical', spacing=8, padding=8)
         ti = TextInput(text='4', input_filter='int', multiline=False)
@@ -908,12 +1564,17 @@ class BeakAIApp(App):
             popup3.dismiss()
             popup("Til o'zgardi", "Til muvaffaqiyatli o'zgartirildi (test).")
 
+        def open_diagnostics(inst):
+            popup3.dismiss()
+            self.sm.current = 'diagnostics'
+
         content = BoxLayout(orientation='vertical', spacing=8, padding=8)
         btn_theme = Button(text='Yorug\'/Qorong\'u rejimni almashtirish', size_hint_y=None, height=dp(48))
         btn_lang = Button(text='Til (UZ/EN/RU)', size_hint_y=None, height=dp(48))
-        content.add_widget(btn_theme); content.add_widget(btn_lang)
-        popup3 = Popup(title="Sozlamalar", content=content, size_hint=(0.9,None), height=dp(220))
-        btn_theme.bind(on_release=toggle_theme); btn_lang.bind(on_release=set_lang)
+        btn_diag = Button(text='Diagnostika', size_hint_y=None, height=dp(48))
+        content.add_widget(btn_theme); content.add_widget(btn_lang); content.add_widget(btn_diag)
+        popup3 = Popup(title="Sozlamalar", content=content, size_hint=(0.9,None), height=dp(280))
+        btn_theme.bind(on_release=toggle_theme); btn_lang.bind(on_release=set_lang); btn_diag.bind(on_release=open_diagnostics)
         popup3.open()
 
 # -----------------------
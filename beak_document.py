@@ -0,0 +1,122 @@
+# beak_document.py
+# Beak AI — document model for the Word editor (no Kivy imports)
+# The document is a list of blocks (one per paragraph; a paragraph that is an
+# "[IMAGE:path]" marker is an image block) instead of one big string. An edit
+# only touches the block being typed in, and each block remembers whether it
+# changed since its XML was last generated, so savers can reuse the rest.
+import itertools
+
+_uids = itertools.count(1)
+
+def parse_image_marker(line):
+    # "[IMAGE:/path/to/file.jpg]" -> "/path/to/file.jpg", anything else -> None
+    line = line.strip()
+    if line.startswith("[IMAGE:") and line.endswith("]"):
+        return line[7:-1]
+    return None
+
+def image_marker(path):
+    return f"[IMAGE:{path}]"
+
+class Block:
+    __slots__ = ('uid', 'text', 'image', 'xml')
+
+    def __init__(self, text=""):
+        self.uid = next(_uids)
+        self.set(text)
+
+    def set(self, text):
+        self.text = text
+        self.image = parse_image_marker(text)
+        # cached serialized form, owned by the writer; None means dirty
+        self.xml = None
+
+class DocumentBuffer:
+    def __init__(self, text=""):
+        self.blocks = [Block()]
+        self.version = 0
+        self.set_text(text)
+
+    def __len__(self):
+        return len(self.blocks)
+
+    def __getitem__(self, index):
+        return self.blocks[index].text
+
+    def __iter__(self):
+        return (b.text for b in self.blocks)
+
+    def texts(self, start=0):
+        return [b.text for b in self.blocks[start:]]
+
+    def text(self):
+        return "\n".join(b.text for b in self.blocks)
+
+    def image_paths(self):
+        return [b.image for b in self.blocks if b.image is not None]
+
+    def set_text(self, text):
+        self.blocks = [Block(t) for t in text.split("\n")] if text else [Block()]
+        self.version += 1
+
+    def is_image(self, index):
+        return self.blocks[index].image is not None
+
+    def replace(self, index, text):
+        # text may contain newlines (Enter pressed): the paragraph is split and
+        # the number of paragraphs now occupying index.. is returned
+        parts = text.split("\n")
+        block = self.blocks[index]
+        if block.text != parts[0]:
+            block.set(parts[0])
+            self.version += 1
+        if len(parts) > 1:
+            self.blocks[index + 1:index + 1] = [Block(t) for t in parts[1:]]
+            self.version += 1
+        return len(parts)
+
+    def insert(self, index, text=""):
+        parts = text.split("\n")
+        self.blocks[index:index] = [Block(t) for t in parts]
+        self.version += 1
+        return len(parts)
+
+    def delete(self, index, count=1):
+        del self.blocks[index:index + count]
+        if not self.blocks:
+            self.blocks.append(Block())
+        self.version += 1
+
+    def splice(self, index, count, texts):
+        # paragraphs index..index+count become texts; returns the old texts
+        # (undo/redo replay edits as splices)
+        old = [b.text for b in self.blocks[index:index + count]]
+        self.blocks[index:index + count] = [Block(t) for t in texts]
+        if not self.blocks:
+            self.blocks.append(Block())
+        self.version += 1
+        return old
+
+    def merge_with_previous(self, index):
+        # backspace at the start of a paragraph; returns the join offset
+        if index <= 0:
+            return None
+        prev = self.blocks[index - 1]
+        offset = len(prev.text)
+        prev.set(prev.text + self.blocks[index].text)
+        del self.blocks[index]
+        self.version += 1
+        return offset
+
+    def append(self, text):
+        # an empty last paragraph is reused; returns the index of the first new one
+        index = len(self.blocks)
+        if not self.blocks[-1].text:
+            index -= 1
+            del self.blocks[index]
+        self.insert(index, text)
+        return index
+
+    def append_image(self, path):
+        # marker plus an empty paragraph to keep typing after the picture
+        return self.append(image_marker(path) + "\n")
@@ -0,0 +1,321 @@
+# beak_docx.py
+# Beak AI — incremental .docx writer for DocumentBuffer (no Kivy imports)
+# The package skeleton (styles, settings, theme...) comes from python-docx's
+# default template and is built once per process. On each save only
+# word/document.xml, its .rels and [Content_Types].xml are generated; paragraph
+# XML is cached on the blocks that did not change, and media parts already
+# written to the previous file are copied over byte-for-byte.
+# Pictures go through a media stage first: downsampled to their display width
+# at MEDIA_DPI, re-encoded, and embedded once per distinct image.
+import os
+import re
+import hashlib
+import zipfile
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from xml.sax.saxutils import escape, quoteattr
+
+from PIL import Image, ImageOps
+from docx import Document
+from docx.shared import Pt
+
+import beak_trace as trace
+
+EMU_PER_INCH = 914400
+IMAGE_WIDTH_IN = 5
+MEDIA_DPI = 150
+JPEG_QUALITY = 85
+MEDIA_WORKERS = min(4, os.cpu_count() or 1)
+DOC_XML = 'word/document.xml'
+DOC_RELS = 'word/_rels/document.xml.rels'
+CONTENT_TYPES = '[Content_Types].xml'
+GENERATED = (DOC_XML, DOC_RELS, CONTENT_TYPES)
+IMAGE_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/image"
+MEDIA_TYPES = {
+    'jpeg': 'image/jpeg', 'png': 'image/png', 'gif': 'image/gif',
+    'bmp': 'image/bmp', 'webp': 'image/webp', 'tiff': 'image/tiff',
+}
+
+_INVALID_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+
+_base = None
+
+# -----------------------
+# Template skeleton
+# -----------------------
+def _base_package():
+    # {part name: bytes} of the template plus the pieces document.xml is built from
+    global _base
+    if _base is not None:
+        return _base
+    doc = Document()
+    style = doc.styles['Normal']
+    style.font.name = 'Times New Roman'
+    style.font.size = Pt(14)
+    buf = BytesIO()
+    doc.save(buf)
+    with zipfile.ZipFile(buf) as zf:
+        parts = {name: zf.read(name) for name in zf.namelist()}
+    doc_xml = parts[DOC_XML].decode('utf-8')
+    body = doc_xml.index('<w:body>') + len('<w:body>')
+    sect = re.search(r'<w:sectPr[\s\S]*</w:sectPr>', doc_xml).group(0)
+    _base = {
+        'parts': {k: v for k, v in parts.items() if k not in GENERATED},
+        'doc_head': doc_xml[:body],
+        'doc_tail': sect + '</w:body></w:document>',
+        'rels': parts[DOC_RELS].decode('utf-8'),
+        'content_types': parts[CONTENT_TYPES].decode('utf-8'),
+    }
+    return _base
+
+def _xml_text(text):
+    return escape(_INVALID_XML.sub('', text))
+
+def _paragraph_xml(text, style=None):
+    ppr = f'<w:pPr><w:pStyle w:val="{style}"/></w:pPr>' if style else ''
+    if not text:
+        return f'<w:p>{ppr}</w:p>'
+    return f'<w:p>{ppr}<w:r><w:t xml:space="preserve">{_xml_text(text)}</w:t></w:r></w:p>'
+
+def _picture_xml(uid, rid, name, cx, cy):
+    return (
+        '<w:p><w:r><w:drawing>'
+        f'<wp:inline distT="0" distB="0" distL="0" distR="0"><wp:extent cx="{cx}" cy="{cy}"/>'
+        f'<wp:docPr id="{uid}" name={quoteattr("Picture %d" % uid)}/>'
+        '<wp:cNvGraphicFramePr><a:graphicFrameLocks xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main" noChangeAspect="1"/></wp:cNvGraphicFramePr>'
+        '<a:graphic xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main">'
+        '<a:graphicData uri="http://schemas.openxmlformats.org/drawingml/2006/picture">'
+        '<pic:pic xmlns:pic="http://schemas.openxmlformats.org/drawingml/2006/picture">'
+        f'<pic:nvPicPr><pic:cNvPr id="0" name={quoteattr(_INVALID_XML.sub("", name))}/><pic:cNvPicPr/></pic:nvPicPr>'
+        f'<pic:blipFill><a:blip r:embed="{rid}"/><a:stretch><a:fillRect/></a:stretch></pic:blipFill>'
+        f'<pic:spPr><a:xfrm><a:off x="0" y="0"/><a:ext cx="{cx}" cy="{cy}"/></a:xfrm>'
+        '<a:prstGeom prst="rect"><a:avLst/></a:prstGeom></pic:spPr>'
+        '</pic:pic></a:graphicData></a:graphic></wp:inline>'
+        '</w:drawing></w:r></w:p>'
+    )
+
+# -----------------------
+# Media
+# -----------------------
+class MediaPart:
+    __slots__ = ('key', 'name', 'rid', 'ext', 'cx', 'cy', 'data')
+
+    def __init__(self, key, name, rid, ext, cx, cy, data=None):
+        self.key, self.name, self.rid, self.ext = key, name, rid, ext
+        self.cx, self.cy, self.data = cx, cy, data
+
+def _source_key(path):
+    st = os.stat(path)
+    return (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+
+def _has_alpha(img):
+    return img.mode in ('RGBA', 'LA', 'PA') or (img.mode == 'P' and 'transparency' in img.info)
+
+def load_media(path, width_in=IMAGE_WIDTH_IN, dpi=MEDIA_DPI):
+    # (bytes, ext, (w, h)) of the picture as it will be stored in the package:
+    # at most width_in * dpi pixels wide, EXIF orientation applied
+    target = max(1, int(width_in * dpi))
+    with Image.open(path) as img:
+        fmt = (img.format or '').lower()
+        # phone cameras often write MPO: a JPEG with extra frames after it
+        jpeg = fmt in ('jpeg', 'mpo')
+        orientation = img.getexif().get(0x0112, 1)
+        if (jpeg or fmt == 'png') and orientation == 1 and img.width <= target:
+            # already small enough: embed the original file untouched
+            with open(path, 'rb') as f:
+                return f.read(), 'jpeg' if jpeg else fmt, img.size
+        if jpeg:
+            # let the JPEG decoder skip the detail that would be thrown away
+            img.draft('RGB', (target, target))
+        img = ImageOps.exif_transpose(img)
+        if img.width > target:
+            img = img.resize((target, max(1, round(img.height * target / img.width))), Image.LANCZOS)
+        buf = BytesIO()
+        if _has_alpha(img):
+            img.save(buf, format='PNG', optimize=True)
+            ext = 'png'
+        else:
+            if img.mode not in ('RGB', 'L'):
+                img = img.convert('RGB')
+            img.save(buf, format='JPEG', quality=JPEG_QUALITY, optimize=True)
+            ext = 'jpeg'
+        return buf.getvalue(), ext, img.size
+
+# -----------------------
+# Writer
+# -----------------------
+class DocxWriter:
+    def __init__(self, dpi=MEDIA_DPI):
+        self.dpi = dpi
+        self._media = {}          # source key -> MediaPart
+        self._by_digest = {}      # sha1 of stored bytes -> MediaPart
+        self._pending = {}        # source key -> future of a load_media result
+        self._written = None      # (path, size, mtime_ns, media names) of the last save
+        self._saved_version = None
+        self._saved_title = None
+        self._next_media = 1
+
+    def _output_intact(self, path):
+        if self._written is None or self._written[0] != str(path):
+            return False
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False
+        return (st.st_size, st.st_mtime_ns) == self._written[1:3]
+
+    def _load(self, path):
+        with trace.span('resample', path=str(path)):
+            return load_media(path, IMAGE_WIDTH_IN, self.dpi)
+
+    def warm(self, path, executor):
+        # start resampling a picture just added to the document, so the next
+        # save finds it ready
+        try:
+            key = _source_key(path)
+        except OSError:
+            return
+        if key not in self._media and key not in self._pending:
+            self._pending[key] = executor.submit(self._load, path)
+
+    def _prefetch(self, paths):
+        # resample the pictures not seen yet in parallel (PIL releases the GIL
+        # while decoding and resizing); returns {source key: load_media result}
+        todo = {}
+        for path in paths:
+            try:
+                key = _source_key(path)
+            except OSError:
+                continue
+            if key not in self._media and key not in self._pending and key not in todo:
+                todo[key] = path
+        if len(todo) < 2:
+            return {}
+        def _safe(path):
+            try:
+                return self._load(path)
+            except Exception:
+                return None  # reported again by _media_for
+        with ThreadPoolExecutor(MEDIA_WORKERS) as pool:
+            return dict(zip(todo, pool.map(_safe, todo.values())))
+
+    def _media_for(self, path, loaded=None):
+        key = _source_key(path)
+        part = self._media.get(key)
+        if part is None:
+            result = loaded.get(key) if loaded else None
+            future = self._pending.pop(key, None)
+            if future is not None and result is None:
+                try:
+                    result = future.result()
+                except Exception:
+                    pass  # reported again by _load below
+            data, ext, (w, h) = result or self._load(path)
+            digest = hashlib.sha1(data).digest()
+            part = self._by_digest.get(digest)
+            if part is None:
+                # the same picture under another name is embedded only once
+                n = self._next_media
+                self._next_media += 1
+                cx = IMAGE_WIDTH_IN * EMU_PER_INCH
+                cy = int(cx * h / w) if w else cx
+                part = MediaPart(key, f"word/media/image{n}.{ext}", f"rIdBeak{n}", ext, cx, cy, data)
+                self._by_digest[digest] = part
+            self._media[key] = part
+        return part
+
+    def _block_xml(self, block, used, loaded=None):
+        if block.image is None:
+            if block.xml is None:
+                block.xml = (None, _paragraph_xml(block.text.strip()))
+            return block.xml[1]
+        if not os.path.exists(block.image):
+            return _paragraph_xml("[Rasm topilmadi]")
+        try:
+            part = self._media_for(block.image, loaded)
+        except Exception as e:
+            trace.record_error('docx.image', e, path=block.image)
+            return _paragraph_xml("[Rasm qo'shishda xatolik]")
+        used[part.name] = part
+        if block.xml is None or block.xml[0] is not part:
+            block.xml = (part, _picture_xml(block.uid, part.rid, Path(block.image).name, part.cx, part.cy))
+        return block.xml[1]
+
+    def save(self, buffer, title, out_path):
+        out_path = Path(out_path)
+        if (self._saved_version == buffer.version and self._saved_title == title
+                and self._output_intact(out_path)):
+            return out_path  # nothing changed since the last save
+        base = _base_package()
+        used = {}
+        loaded = self._prefetch(buffer.image_paths())
+        with trace.span('layout', blocks=len(buffer)):
+            body = [base['doc_head']]
+            if title:
+                body.append(_paragraph_xml(title, style='Heading1'))
+            body.extend(self._block_xml(b, used, loaded) for b in buffer.blocks)
+            body.append(base['doc_tail'])
+            doc_xml = ''.join(body).encode('utf-8')
+        with trace.span('write', media=len(used)):
+            self._write(out_path, base, doc_xml, used)
+        for future in self._pending.values():
+            future.cancel()  # pictures removed again before this save
+        self._pending.clear()
+        self._saved_version = buffer.version
+        self._saved_title = title
+        return out_path
+
+    def _write(self, out_path, base, doc_xml, used):
+        previous = None
+        if self._output_intact(out_path):
+            previous = zipfile.ZipFile(out_path)
+            prev_names = self._written[3]
+        tmp = out_path.with_name(out_path.name + '.tmp')
+        try:
+            with zipfile.ZipFile(tmp, 'w', zipfile.ZIP_DEFLATED, compresslevel=1) as zf:
+                zf.writestr(CONTENT_TYPES, self._content_types(base, used))
+                for name, data in base['parts'].items():
+                    zf.writestr(name, data)
+                zf.writestr(DOC_RELS, self._rels(base, used))
+                zf.writestr(DOC_XML, doc_xml, compress_type=zipfile.ZIP_DEFLATED)
+                for part in used.values():
+                    # pictures are already compressed: stored as-is
+                    if previous is not None and part.name in prev_names:
+                        data = previous.read(part.name)
+                    elif part.data is not None:
+                        data = part.data
+                    else:
+                        data = load_media(part.key[0], IMAGE_WIDTH_IN, self.dpi)[0]
+                    zf.writestr(part.name, data, compress_type=zipfile.ZIP_STORED)
+                    part.data = None  # on disk now; copied from there next time
+        except BaseException:
+            if tmp.exists():
+                tmp.unlink()  # no half-written file left next to the output
+            raise
+        finally:
+            if previous is not None:
+                previous.close()
+        os.replace(tmp, out_path)
+        st = os.stat(out_path)
+        self._written = (str(out_path), st.st_size, st.st_mtime_ns, frozenset(used))
+        # forget pictures no longer referenced by the document
+        for key, part in list(self._media.items()):
+            if part.name not in used:
+                del self._media[key]
+        for digest, part in list(self._by_digest.items()):
+            if part.name not in used:
+                del self._by_digest[digest]
+
+    def _rels(self, base, used):
+        rels = ''.join(
+            f'<Relationship Id="{p.rid}" Type="{IMAGE_REL}" Target="{p.name[len("word/"):]}"/>'
+            for p in used.values())
+        return base['rels'].replace('</Relationships>', rels + '</Relationships>').encode('utf-8')
+
+    def _content_types(self, base, used):
+        ct = base['content_types']
+        for ext in sorted({p.ext for p in used.values()}):
+            if f'Extension="{ext}"' not in ct:
+                ct = ct.replace('<Default ', f'<Default Extension="{ext}" ContentType="{MEDIA_TYPES[ext]}"/><Default ', 1)
+        return ct.encode('utf-8')
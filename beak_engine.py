@@ -0,0 +1,393 @@
+# beak_engine.py
+# Beak AI — headless conversion engine (no Kivy imports)
+# Image→PDF, Word (.docx), Presentation (.pdf/.pptx) and Excel (.xlsx) pipelines.
+# The app screens call into this module; it also runs standalone as a batch CLI:
+#   python beak_engine.py pdf  PHOTO_DIRS...  -o OUT_DIR   (one PDF per directory)
+#   python beak_engine.py docx TXT_DIRS...    -o OUT_DIR   (*.txt  -> .docx)
+#   python beak_engine.py text-pdf TXT_DIRS...  -o OUT_DIR (*.txt  -> .pdf, real text)
+#   python beak_engine.py pptx JSON_DIRS...   -o OUT_DIR   (*.json slides -> .pptx)
+#   python beak_engine.py slides-pdf JSON_DIRS... -o OUT_DIR
+#   python beak_engine.py xlsx CSV_DIRS...    -o OUT_DIR   (*.csv  -> .xlsx)
+import os
+import sys
+import csv
+import json
+import time
+import hashlib
+import argparse
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from PIL import Image, ImageDraw, ImageFont, ImageOps
+from docx import Document
+from pptx import Presentation
+from pptx.dml.color import RGBColor
+from pptx.util import Inches, Pt
+from openpyxl import Workbook, load_workbook
+from openpyxl.utils.cell import coordinate_from_string, column_index_from_string, get_column_letter, range_boundaries
+
+import beak_trace as trace
+from beak_docx import DocxWriter
+from beak_pdf import document_to_pdf
+from beak_document import DocumentBuffer, image_marker
+
+IMAGE_EXTS = ('.png', '.jpg', '.jpeg', '.webp', '.bmp')
+PAGE_MAX = (1240, 1754)  # A4 @ 150 dpi
+SLIDE_SIZE = (1240, 700)
+
+# -----------------------
+# Image -> PDF
+# -----------------------
+def load_page(path, max_size=PAGE_MAX):
+    # one page image, decoded and fitted into max_size
+    with trace.span('decode', path=str(path)):
+        img = Image.open(path)
+        w, h = img.size
+        # the page is fitted as displayed, i.e. after the EXIF rotation
+        turned = img.getexif().get(0x0112, 1) in (5, 6, 7, 8)
+        scale = min(max_size[0] / (h if turned else w), max_size[1] / (w if turned else h))
+        if scale < 1:
+            # JPEGs decode straight at a reduced scale, never below the fit
+            img.draft('RGB', (int(w * scale) + 1, int(h * scale) + 1))
+        img = ImageOps.exif_transpose(img).convert("RGB")
+    with trace.span('resample'):
+        img.thumbnail(max_size, Image.LANCZOS)
+    return img
+
+def images_to_pdf(paths, out_path, max_size=PAGE_MAX, quality=95, load=None):
+    # load(path) may hand over pages decoded ahead of time (see beak_probe)
+    paths = list(paths)
+    if not paths:
+        raise ValueError("No images given")
+    pil_images = [load(p) if load else load_page(p, max_size) for p in paths]
+    with trace.span('encode', pages=len(pil_images)):
+        pil_images[0].save(str(out_path), save_all=True, append_images=pil_images[1:], quality=quality)
+    return Path(out_path)
+
+# -----------------------
+# Word
+# -----------------------
+def text_to_docx(title, content, out_path):
+    return DocxWriter().save(DocumentBuffer(content), title, out_path)
+
+def text_to_pdf(title, content, out_path):
+    return document_to_pdf(DocumentBuffer(content), title, out_path)
+
+_BLIP = '{http://schemas.openxmlformats.org/drawingml/2006/main}blip'
+_EMBED = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}embed'
+
+def _extract_pictures(part, paragraph, media_dir):
+    # inline pictures of a paragraph, written to media_dir under a name taken
+    # from their content (reopening the same document reuses the files)
+    paths = []
+    for blip in paragraph._p.iter(_BLIP):
+        image = part.related_parts.get(blip.get(_EMBED))
+        if image is None:
+            continue
+        blob = image.blob
+        dest = Path(media_dir) / f"{hashlib.sha1(blob).hexdigest()[:20]}.{image.partname.ext}"
+        if not dest.exists():
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            tmp = dest.with_name(dest.name + '.tmp')
+            tmp.write_bytes(blob)
+            os.replace(tmp, dest)
+        paths.append(str(dest))
+    return paths
+
+def docx_to_text(path, media_dir):
+    # (title, text) in the editor's format; a leading heading becomes the title
+    # and pictures come back as [IMAGE:...] markers pointing into media_dir
+    doc = Document(str(path))
+    title, lines = "", []
+    for p in doc.paragraphs:
+        if not lines and not title and p.style.name.startswith('Heading'):
+            title = p.text
+            continue
+        pictures = _extract_pictures(doc.part, p, media_dir)
+        if p.text or not pictures:
+            lines.append(p.text)
+        lines.extend(image_marker(x) for x in pictures)
+    return title, "\n".join(lines)
+
+# -----------------------
+# Presentation
+# -----------------------
+def new_slide():
+    return {'title': '', 'text': '', 'images': [], 'font_size': 20, 'bg_color': '#ffffff'}
+
+def hex_to_rgb(value):
+    value = value.lstrip('#')
+    return int(value[0:2], 16), int(value[2:4], 16), int(value[4:6], 16)
+
+def _slide_fonts(font_size):
+    # default font (may not match on mobile)
+    try:
+        return ImageFont.truetype("arial.ttf", 36), ImageFont.truetype("arial.ttf", font_size)
+    except Exception:
+        return ImageFont.load_default(), ImageFont.load_default()
+
+def render_slide(s, size=SLIDE_SIZE):
+    W, H = size
+    img = Image.new('RGB', (W, H), s.get('bg_color', '#ffffff'))
+    draw = ImageDraw.Draw(img)
+    f_title, f_body = _slide_fonts(s.get('font_size', 20))
+    draw.text((40, 40), s.get('title', ''), font=f_title, fill=(0, 0, 0))
+    draw.text((40, 120), s.get('text', ''), font=f_body, fill=(0, 0, 0))
+    y = 200
+    for ipath in s.get('images', [])[:3]:
+        try:
+            with trace.span('decode', path=str(ipath)):
+                im = Image.open(ipath)
+                im.load()
+            with trace.span('resample'):
+                im.thumbnail((W - 100, 300), Image.LANCZOS)
+            img.paste(im, (40, y))
+            y += im.size[1] + 20
+        except Exception as e:
+            trace.record_error('slide.image', e, path=str(ipath))
+    return img
+
+def slides_to_pdf(slides, out_path, quality=90):
+    if not slides:
+        raise ValueError("No slides given")
+    images = []
+    for i, s in enumerate(slides):
+        with trace.span('layout', slide=i + 1):
+            images.append(render_slide(s))
+    with trace.span('encode', pages=len(images)):
+        images[0].save(str(out_path), save_all=True, append_images=images[1:], quality=quality)
+    return Path(out_path)
+
+def _add_pptx_slide(prs, s):
+    slide = prs.slides.add_slide(prs.slide_layouts[6])  # blank
+    try:
+        slide.background.fill.solid()
+        slide.background.fill.fore_color.rgb = RGBColor(*hex_to_rgb(s.get('bg_color', '#FFFFFF')))
+    except Exception as e:
+        trace.record_error('slide.background', e, value=s.get('bg_color'))
+    if s.get('title'):
+        tf = slide.shapes.add_textbox(Inches(0.5), Inches(0.3), Inches(9), Inches(1)).text_frame
+        run = tf.paragraphs[0].add_run()
+        run.text = s.get('title', '')
+        run.font.size = Pt(28)
+    if s.get('text'):
+        tf = slide.shapes.add_textbox(Inches(0.5), Inches(1.2), Inches(9), Inches(4)).text_frame
+        run = tf.paragraphs[0].add_run()
+        run.text = s.get('text', '')
+        run.font.size = Pt(s.get('font_size', 20))
+    for ipath in s.get('images', [])[:3]:
+        try:
+            with trace.span('decode', path=str(ipath)):
+                slide.shapes.add_picture(str(ipath), Inches(0.5), Inches(3.5), width=Inches(5))
+        except Exception as e:
+            trace.record_error('slide.image', e, path=str(ipath))
+
+def slides_to_pptx(slides, out_path):
+    prs = Presentation()
+    for i, s in enumerate(slides):
+        with trace.span('layout', slide=i + 1):
+            _add_pptx_slide(prs, s)
+    with trace.span('write'):
+        prs.save(str(out_path))
+    return Path(out_path)
+
+# -----------------------
+# Excel
+# -----------------------
+def _sum_range(values, rng):
+    # simple formula handling: =SUM(A1:B2), non-numeric cells are skipped
+    total = 0
+    try:
+        min_col, min_row, max_col, max_row = range_boundaries(rng)
+    except Exception:
+        return 0
+    for r in range(min_row, max_row + 1):
+        for c in range(min_col, max_col + 1):
+            try:
+                total += float(str(values.get(f"{get_column_letter(c)}{r}", "")).strip())
+            except ValueError:
+                pass
+    return total
+
+def evaluate_cells(values):
+    # values: {"A1": "12", "B3": "=SUM(A1:A9)", ...} -> {"A1": "12", "B3": 12.0, ...}
+    out = {}
+    for key, raw in values.items():
+        val = str(raw).strip()
+        if val.startswith('=SUM(') and val.endswith(')'):
+            out[key] = _sum_range(values, val[5:-1])
+        else:
+            out[key] = val
+    return out
+
+def cells_to_xlsx(values, out_path):
+    with trace.span('layout', cells=len(values)):
+        wb = Workbook()
+        ws = wb.active
+        for key, val in evaluate_cells(values).items():
+            col, row = coordinate_from_string(key)
+            ws.cell(row=row, column=column_index_from_string(col), value=val)
+    with trace.span('write'):
+        wb.save(str(out_path))
+    return Path(out_path)
+
+def read_xlsx(path, rows=10, cols=10):
+    # top-left rows x cols block of the active sheet as {"A1": "text", ...}
+    with trace.span('decode', path=str(path)):
+        wb = load_workbook(path, read_only=True)
+    try:
+        ws = wb.active
+        out = {}
+        for r_idx, row in enumerate(ws.iter_rows(min_row=1, max_row=rows, max_col=cols, values_only=True), start=1):
+            for c_idx, v in enumerate(row, start=1):
+                out[f"{get_column_letter(c_idx)}{r_idx}"] = "" if v is None else str(v)
+        return out
+    finally:
+        wb.close()
+
+def csv_to_cells(path):
+    values = {}
+    with open(path, newline='', encoding='utf-8') as f:
+        for r_idx, row in enumerate(csv.reader(f), start=1):
+            for c_idx, v in enumerate(row, start=1):
+                if v != "":
+                    values[f"{get_column_letter(c_idx)}{r_idx}"] = v
+    return values
+
+# -----------------------
+# Batch jobs
+# -----------------------
+def _convert_txt_docx(src, dst):
+    text_to_docx("", Path(src).read_text(encoding='utf-8'), dst)
+
+def _convert_txt_pdf(src, dst):
+    text_to_pdf("", Path(src).read_text(encoding='utf-8'), dst)
+
+def _convert_json_pptx(src, dst):
+    slides_to_pptx(json.loads(Path(src).read_text(encoding='utf-8')), dst)
+
+def _convert_json_pdf(src, dst):
+    slides_to_pdf(json.loads(Path(src).read_text(encoding='utf-8')), dst)
+
+def _convert_csv_xlsx(src, dst):
+    cells_to_xlsx(csv_to_cells(src), dst)
+
+def _convert_dir_pdf(src, dst):
+    images_to_pdf(list_images(src), dst)
+
+# command -> (source suffix or None for "one job per directory", output suffix, converter)
+CONVERTERS = {
+    'pdf': (None, '.pdf', _convert_dir_pdf),
+    'docx': ('.txt', '.docx', _convert_txt_docx),
+    'text-pdf': ('.txt', '.pdf', _convert_txt_pdf),
+    'pptx': ('.json', '.pptx', _convert_json_pptx),
+    'slides-pdf': ('.json', '.pdf', _convert_json_pdf),
+    'xlsx': ('.csv', '.xlsx', _convert_csv_xlsx),
+}
+
+def list_images(directory):
+    return sorted(str(p) for p in Path(directory).iterdir() if p.suffix.lower() in IMAGE_EXTS)
+
+def _unique(path, taken):
+    # path, or path with -2, -3, ... before the suffix if already taken
+    stem, n = path.with_suffix(''), 2
+    while str(path) in taken:
+        path = Path(f"{stem}-{n}{path.suffix}")
+        n += 1
+    taken.add(str(path))
+    return path
+
+def collect_jobs(command, sources, out_dir):
+    # outputs mirror the layout below each source directory, so equal file
+    # names in different subfolders never share an output (or its .tmp)
+    suffix, out_suffix, _ = CONVERTERS[command]
+    out_dir = Path(out_dir)
+    jobs, taken = [], set()
+    def add(src, rel):
+        dst = _unique(out_dir / Path(str(rel) + out_suffix), taken)
+        jobs.append((command, str(src), str(dst)))
+    for src in sources:
+        src = Path(src)
+        if suffix is None:
+            # every directory that holds images becomes one PDF
+            dirs = [src] + sorted(p for p in src.rglob('*') if p.is_dir())
+            for d in dirs:
+                if list_images(d):
+                    # src -> <src>.pdf, src/a/b -> <src>/a/b.pdf: one tree per source
+                    add(d, Path(src.name) / d.relative_to(src) if d != src else src.name)
+        elif src.is_dir():
+            for f in sorted(src.rglob('*' + suffix)):
+                add(f, f.relative_to(src).with_suffix(''))
+        elif src.suffix.lower() == suffix:
+            add(src, src.stem)
+    return jobs
+
+def check_sources(command, sources):
+    # problems that would make collect_jobs skip or fail on a source
+    suffix = CONVERTERS[command][0]
+    problems = []
+    for src in map(Path, sources):
+        if not src.exists():
+            problems.append(f"{src}: no such file or directory")
+        elif suffix is None and not src.is_dir():
+            problems.append(f"{src}: '{command}' takes directories of images")
+        elif suffix is not None and src.is_file() and src.suffix.lower() != suffix:
+            problems.append(f"{src}: '{command}' takes {suffix} files or directories")
+    return problems
+
+def run_job(job):
+    command, src, dst = job
+    t0 = time.perf_counter()
+    try:
+        Path(dst).parent.mkdir(parents=True, exist_ok=True)
+        CONVERTERS[command][2](src, dst)
+        return src, dst, None, time.perf_counter() - t0
+    except Exception as e:
+        return src, dst, f"{type(e).__name__}: {e}", time.perf_counter() - t0
+
+def run_batch(jobs, workers=None):
+    # returns (results, wall seconds); results are run_job() tuples
+    t0 = time.perf_counter()
+    results = []
+    if workers == 1:
+        results = [run_job(j) for j in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(run_job, j) for j in jobs]
+            for fut in as_completed(futures):
+                results.append(fut.result())
+    return results, time.perf_counter() - t0
+
+# -----------------------
+# CLI
+# -----------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="beak_engine", description="Beak AI batch converter")
+    parser.add_argument('command', choices=sorted(CONVERTERS))
+    parser.add_argument('sources', nargs='+', help="input directories or files")
+    parser.add_argument('-o', '--out', required=True, help="output directory")
+    parser.add_argument('-j', '--workers', type=int, default=None, help="process pool size (default: CPU count)")
+    parser.add_argument('-q', '--quiet', action='store_true')
+    args = parser.parse_args(argv)
+    problems = check_sources(args.command, args.sources)
+    if problems:
+        parser.error("\n  ".join(["invalid sources:"] + problems))
+
+    Path(args.out).mkdir(parents=True, exist_ok=True)
+    jobs = collect_jobs(args.command, args.sources, args.out)
+    if not jobs:
+        print("Nothing to convert", file=sys.stderr)
+        return 1
+    results, wall = run_batch(jobs, args.workers)
+    failed = [r for r in results if r[2]]
+    if not args.quiet:
+        for src, dst, err, secs in results:
+            print(f"{'FAIL' if err else 'ok  '} {secs:7.3f}s  {src} -> {dst}" + (f"  ({err})" if err else ""))
+    done = len(results) - len(failed)
+    rate = done / wall if wall > 0 else 0.0
+    print(f"{done}/{len(results)} converted in {wall:.2f}s — {rate:.2f} docs/s, {rate * 3600:.0f} docs/hour"
+          f" ({args.workers or os.cpu_count()} workers)")
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,140 @@
+# beak_history.py
+# Beak AI — undo/redo shared by the editors (no Kivy imports)
+# History is a log of inverse operations, not snapshots: each entry holds the
+# operation that redoes a change and the one that undoes it, both describing
+# only the part that changed (one paragraph, one cell, one slide field). The
+# editor owning the history interprets operations in its apply() callback, so
+# undo/redo cost and memory follow the size of the change, not the document.
+# Repeated edits of the same target (typing in one paragraph or cell) are
+# coalesced into one entry, and once the log outgrows its byte budget the
+# oldest entries are evicted.
+import sys
+import time
+from collections import deque
+from contextlib import contextmanager
+
+DEFAULT_BUDGET = 2 * 2**20     # bytes of history per editor
+COALESCE_SECONDS = 1.5
+
+def op_size(obj):
+    # rough footprint of an operation; its strings dominate
+    if isinstance(obj, str):
+        return sys.getsizeof(obj)
+    if isinstance(obj, (tuple, list)):
+        return sys.getsizeof(obj) + sum(op_size(o) for o in obj)
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(op_size(k) + op_size(v) for k, v in obj.items())
+    return 16
+
+class Entry:
+    __slots__ = ('label', 'undo', 'redo', 'key', 'ts', 'size')
+
+    def __init__(self, label, undo, redo, key, ts):
+        self.label, self.undo, self.redo, self.key, self.ts = label, undo, redo, key, ts
+        self.size = op_size(undo) + op_size(redo)
+
+class History:
+    def __init__(self, apply, budget=DEFAULT_BUDGET, coalesce=COALESCE_SECONDS):
+        self.apply = apply
+        self.budget = budget
+        self.coalesce = coalesce
+        self.size = 0
+        self.applying = False
+        self._undo = deque()
+        self._redo = []
+        self._group = None
+
+    def __len__(self):
+        return len(self._undo)
+
+    @property
+    def can_undo(self):
+        return bool(self._undo)
+
+    @property
+    def can_redo(self):
+        return bool(self._redo)
+
+    def record(self, undo, redo, key=None, label=''):
+        # undo restores the state from before redo; edits made while an undo
+        # or redo is being applied are not recorded again
+        if self.applying:
+            return
+        if self._group is not None:
+            self._group.append((undo, redo))
+            return
+        self._push([undo], [redo], key, label)
+
+    @contextmanager
+    def group(self, label=''):
+        # everything recorded inside becomes one entry
+        if self._group is not None:
+            yield
+            return
+        self._group = ops = []
+        try:
+            yield
+        finally:
+            self._group = None
+            if ops:
+                self._push([u for u, _ in ops], [r for _, r in ops], None, label)
+
+    def _push(self, undo, redo, key, label):
+        self._drop_redo()
+        now = time.monotonic()
+        last = self._undo[-1] if self._undo else None
+        if key is not None and last is not None and last.key == key and now - last.ts <= self.coalesce:
+            # same target again: keep the oldest undo, take the newest redo
+            self.size -= last.size
+            last.redo, last.ts = redo, now
+            last.size = op_size(last.undo) + op_size(redo)
+            self.size += last.size
+        else:
+            entry = Entry(label, undo, redo, key, now)
+            self._undo.append(entry)
+            self.size += entry.size
+        self._trim()
+
+    def _trim(self):
+        # the newest entry is always kept, however large
+        while self.size > self.budget and len(self._undo) > 1:
+            self.size -= self._undo.popleft().size
+
+    def _drop_redo(self):
+        for entry in self._redo:
+            self.size -= entry.size
+        self._redo.clear()
+
+    def _run(self, ops):
+        self.applying = True
+        try:
+            for op in ops:
+                self.apply(op)
+        finally:
+            self.applying = False
+
+    def undo(self):
+        if not self._undo:
+            return None
+        entry = self._undo.pop()
+        self._run(reversed(entry.undo))
+        entry.ts = float('-inf')  # an undone entry never absorbs new edits
+        self._redo.append(entry)
+        return entry.label
+
+    def redo(self):
+        if not self._redo:
+            return None
+        entry = self._redo.pop()
+        self._run(entry.redo)
+        self._undo.append(entry)
+        return entry.label
+
+    def set_budget(self, budget):
+        self.budget = budget
+        self._trim()
+
+    def clear(self):
+        self._undo.clear()
+        self._redo.clear()
+        self.size = 0
@@ -0,0 +1,253 @@
+# beak_library.py
+# Beak AI — persistent index of the files under BASE_DIR (no Kivy imports)
+# One SQLite row per file: kind, size, mtime, page/slide/sheet count and a small
+# PNG thumbnail. scan() only re-probes files whose size or mtime changed, so the
+# "recent files" view is a single indexed query however many files there are.
+import os
+import re
+import mmap
+import time
+import sqlite3
+import zipfile
+import threading
+from io import BytesIO
+from pathlib import Path
+
+from PIL import Image
+
+import beak_trace as trace
+
+DB_NAME = "library.sqlite3"
+INDEX_VERSION = 2  # bump when probes change; the index is rebuilt once
+SKIP_DIRS = {"Temp"}
+THUMB_SIZE = (128, 128)
+KINDS = {
+    '.pdf': 'pdf',
+    '.docx': 'docx',
+    '.pptx': 'pptx',
+    '.xlsx': 'xlsx',
+    '.png': 'image', '.jpg': 'image', '.jpeg': 'image', '.webp': 'image', '.bmp': 'image',
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    pages INTEGER,
+    thumb BLOB,
+    indexed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_mtime ON files (mtime DESC);
+"""
+
+_PDF_PAGE = re.compile(rb"/Type\s*/Page(?![a-zA-Z])")
+_PDF_JPEG = re.compile(rb"/Filter\s*/DCTDecode")
+_PDF_LENGTH = re.compile(rb"/Length\s+(\d+)(?!\s+\d+\s+R)")
+_PDF_STREAM = re.compile(rb">>\s*stream\r?\n")
+
+# -----------------------
+# Probing (only runs for new or changed files)
+# -----------------------
+def _thumb_png(img):
+    img = img.convert('RGB') if img.mode not in ('RGB', 'L') else img
+    img.thumbnail(THUMB_SIZE)
+    buf = BytesIO()
+    img.save(buf, format='PNG', optimize=True)
+    return buf.getvalue()
+
+def _thumb_from_bytes(data):
+    img = Image.open(BytesIO(data))
+    img.draft('RGB', THUMB_SIZE)
+    return _thumb_png(img)
+
+def _zip_first_media(zf, prefix):
+    for name in sorted(zf.namelist()):
+        if name.startswith(prefix) and Path(name).suffix.lower() in ('.png', '.jpg', '.jpeg', '.bmp', '.webp'):
+            return zf.read(name)
+    return None
+
+def _probe_image(path):
+    with Image.open(path) as img:
+        img.draft('RGB', THUMB_SIZE)
+        return 1, _thumb_png(img)
+
+def _pdf_first_jpeg(m):
+    # bytes of the first DCTDecode (JPEG) image stream, or None
+    hit = _PDF_JPEG.search(m)
+    if not hit:
+        return None
+    start = m.rfind(b"<<", 0, hit.start())
+    stream = _PDF_STREAM.search(m, hit.end())
+    if start < 0 or not stream:
+        return None
+    length = _PDF_LENGTH.search(m, start, stream.start())
+    if length:
+        return m[stream.end():stream.end() + int(length.group(1))]
+    end = m.find(b"endstream", stream.end())
+    return m[stream.end():end] if end > 0 else None
+
+def _probe_pdf(path):
+    # page objects are counted without rendering; the first embedded JPEG
+    # (every page of an Image->PDF export) serves as the thumbnail
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        pages = len(_PDF_PAGE.findall(m))
+        thumb = None
+        try:
+            data = _pdf_first_jpeg(m)
+            thumb = _thumb_from_bytes(data) if data else None
+        except Exception as e:
+            trace.record_error('library.thumb', e, path=str(path))
+        return pages, thumb
+
+def _probe_docx(path):
+    # no page count: it depends on layout, and the <Pages> in docProps/app.xml
+    # is whatever the template said (1 for everything python-docx writes)
+    with zipfile.ZipFile(path) as zf:
+        media = _zip_first_media(zf, 'word/media/')
+        return None, _thumb_from_bytes(media) if media else None
+
+def _probe_pptx(path):
+    with zipfile.ZipFile(path) as zf:
+        names = zf.namelist()
+        slides = sum(1 for n in names if re.fullmatch(r"ppt/slides/slide\d+\.xml", n))
+        media = _zip_first_media(zf, 'ppt/media/')
+        return slides, _thumb_from_bytes(media) if media else None
+
+def _probe_xlsx(path):
+    with zipfile.ZipFile(path) as zf:
+        return sum(1 for n in zf.namelist() if re.fullmatch(r"xl/worksheets/sheet\d+\.xml", n)), None
+
+PROBES = {
+    'image': _probe_image,
+    'pdf': _probe_pdf,
+    'docx': _probe_docx,
+    'pptx': _probe_pptx,
+    'xlsx': _probe_xlsx,
+}
+
+def probe(path, kind):
+    # (pages, thumb_png_or_None); broken files are indexed without metadata
+    try:
+        return PROBES[kind](path)
+    except Exception as e:
+        trace.record_error('library.probe', e, path=str(path))
+        return None, None
+
+# -----------------------
+# Library
+# -----------------------
+class Library:
+    def __init__(self, root, db_path=None):
+        self.root = Path(root)
+        self.db_path = Path(db_path) if db_path else self.root / "Temp" / DB_NAME
+        self._scan_lock = threading.Lock()
+        self._thread = None
+        con = self._connect()
+        try:
+            con.executescript(SCHEMA)
+            if con.execute("PRAGMA user_version").fetchone()[0] != INDEX_VERSION:
+                # rows probed by older code are re-probed on the next scan
+                con.execute("DELETE FROM files")
+                con.execute(f"PRAGMA user_version = {INDEX_VERSION}")
+                con.commit()
+        finally:
+            con.close()
+
+    def _connect(self):
+        # one short-lived connection per call, so the background scan and the
+        # UI thread never share a connection
+        con = sqlite3.connect(str(self.db_path), timeout=10)
+        con.execute("PRAGMA journal_mode=WAL")
+        return con
+
+    def _walk(self):
+        stack = [self.root]
+        while stack:
+            d = stack.pop()
+            try:
+                entries = list(os.scandir(d))
+            except OSError:
+                continue
+            for e in entries:
+                if e.is_dir(follow_symlinks=False):
+                    if not (d == self.root and e.name in SKIP_DIRS):
+                        stack.append(e.path)
+                    continue
+                kind = KINDS.get(os.path.splitext(e.name)[1].lower())
+                if kind is None:
+                    continue
+                try:
+                    st = e.stat()
+                except OSError:
+                    continue
+                yield e.path, kind, st.st_size, st.st_mtime
+
+    def scan(self):
+        # returns (changed, removed, unchanged)
+        with self._scan_lock, trace.span('library.scan') as attrs:
+            con = self._connect()
+            try:
+                known = {p: (s, m) for p, s, m in con.execute("SELECT path, size, mtime FROM files")}
+                changed = unchanged = 0
+                now = time.time()
+                for path, kind, size, mtime in self._walk():
+                    old = known.pop(path, None)
+                    if old == (size, mtime):
+                        unchanged += 1
+                        continue
+                    pages, thumb = probe(path, kind)
+                    con.execute(
+                        "INSERT OR REPLACE INTO files (path, kind, size, mtime, pages, thumb, indexed_at)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (path, kind, size, mtime, pages, thumb, now))
+                    changed += 1
+                if known:
+                    con.executemany("DELETE FROM files WHERE path = ?", [(p,) for p in known])
+                con.commit()
+            finally:
+                con.close()
+            attrs.update(changed=changed, removed=len(known), unchanged=unchanged)
+            return changed, len(known), unchanged
+
+    def rescan_async(self, on_done=None):
+        # background rescan; a call while one is running is a no-op
+        if self._thread is not None and self._thread.is_alive():
+            return False
+        def _run():
+            try:
+                result = self.scan()
+            except Exception as e:
+                trace.record_error('library.scan', e)
+                result = None
+            if on_done:
+                on_done(result)
+        self._thread = threading.Thread(target=_run, name='library-scan', daemon=True)
+        self._thread.start()
+        return True
+
+    def recent(self, limit=200, kind=None):
+        # [{'path', 'kind', 'size', 'mtime', 'pages', 'has_thumb'}], newest first
+        sql = "SELECT path, kind, size, mtime, pages, thumb IS NOT NULL FROM files"
+        args = []
+        if kind:
+            sql += " WHERE kind = ?"
+            args.append(kind)
+        sql += " ORDER BY mtime DESC LIMIT ?"
+        args.append(limit)
+        con = self._connect()
+        try:
+            rows = con.execute(sql, args).fetchall()
+        finally:
+            con.close()
+        keys = ('path', 'kind', 'size', 'mtime', 'pages', 'has_thumb')
+        return [dict(zip(keys, r)) for r in rows]
+
+    def thumbnail(self, path):
+        con = self._connect()
+        try:
+            row = con.execute("SELECT thumb FROM files WHERE path = ?", (str(path),)).fetchone()
+        finally:
+            con.close()
+        return row[0] if row else None
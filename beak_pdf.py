@@ -0,0 +1,368 @@
+# beak_pdf.py
+# Beak AI — Word document to PDF on top of FPDF 1.7.2 (no Kivy imports)
+# Text is set in an embedded, subsetted TrueType font (real text, never a
+# bitmap). FPDF normally keeps the whole file in one string until output();
+# here every finished page is compressed into a spool file as soon as the next
+# one starts, pictures are spooled when first placed, and the PDF body is
+# written straight to disk, so memory does not grow with the page count.
+# Parsed font metrics and built font subsets are cached per process (and the
+# metrics on disk too, once configure(cache_dir) is called).
+import os
+import re
+import zlib
+import tempfile
+import threading
+import importlib.util
+from io import BytesIO
+from pathlib import Path
+
+from PIL import Image
+from fpdf import FPDF
+from fpdf import fpdf as fpdf_module
+from fpdf.ttfonts import TTFontFile
+
+import beak_trace as trace
+from beak_docx import load_media, _source_key, IMAGE_WIDTH_IN, MEDIA_DPI
+
+MM_PER_INCH = 25.4
+MARGIN = 20            # mm
+BODY_SIZE = 12         # pt
+TITLE_SIZE = 18
+LINE_H = 6             # mm, for BODY_SIZE
+TITLE_H = 9
+SUBSET_CACHE = 8
+
+FONT_DIRS = ('/system/fonts', '/usr/share/fonts/truetype/dejavu', '/usr/share/fonts/TTF',
+             '/usr/share/fonts/truetype/noto', 'C:/Windows/Fonts')
+REGULAR_FONTS = ('DejaVuSans.ttf', 'NotoSans-Regular.ttf', 'Roboto-Regular.ttf', 'arial.ttf')
+BOLD_FONTS = ('DejaVuSans-Bold.ttf', 'NotoSans-Bold.ttf', 'Roboto-Bold.ttf', 'arialbd.ttf')
+# Uzbek Cyrillic letters and the Latin okina (oʻ, gʻ)
+COVERAGE = "АаЯяЎўҚқҒғҲҳʻ"
+# always part of the subset, so re-exports usually hit the subset cache
+BASE_CHARS = (list(range(32, 127)) + list(range(0xA0, 0x180)) + list(range(0x400, 0x460))
+              + [ord(c) for c in "ҒғҚқҲҳʻʼ‘’“”«»–—…№"])
+
+_NON_BMP = re.compile('[^\u0000-\uffff]')
+_CONTROL = re.compile('[\x00-\x08\x0b-\x1f]')
+
+_lock = threading.Lock()
+_metrics = {}       # (path, size, mtime_ns) -> (fonts entry, font_files entry)
+_subsets = {}       # (source key, code points) -> (stream, codeToGlyph, maxUni)
+_chosen = {}        # candidate names -> font path or None
+_cache_dir = None
+
+def configure(cache_dir=None):
+    # persist parsed font metrics as FPDF pickles under cache_dir
+    global _cache_dir
+    _cache_dir = Path(cache_dir) if cache_dir else None
+    if _cache_dir is not None:
+        _cache_dir.mkdir(parents=True, exist_ok=True)
+
+# -----------------------
+# Fonts
+# -----------------------
+def _font_dirs():
+    spec = importlib.util.find_spec('kivy')
+    dirs = []
+    if spec is not None and spec.submodule_search_locations:
+        dirs.append(os.path.join(list(spec.submodule_search_locations)[0], 'data', 'fonts'))
+    return dirs + list(FONT_DIRS)
+
+def _font_metrics(path):
+    # FPDF's parsed form of a TTF (widths, descriptor), shared by every export
+    key = _source_key(path)
+    with _lock:
+        cached = _metrics.get(key)
+        if cached is None:
+            with trace.span('pdf.font', path=str(path)):
+                # FPDF would otherwise try to write a .pkl next to the font
+                fpdf_module.set_global('FPDF_CACHE_MODE', 2 if _cache_dir else 1)
+                fpdf_module.set_global('FPDF_CACHE_DIR', str(_cache_dir) if _cache_dir else None)
+                probe = FPDF()
+                probe.add_font('f', '', str(path), uni=True)
+                font = dict(probe.fonts['f'])
+                del font['subset']
+                cached = _metrics[key] = (font, probe.font_files['f'])
+    return cached
+
+def _covers(font, chars):
+    cw = font['cw']
+    return all(ord(c) < len(cw) and cw[ord(c)] for c in chars)
+
+def find_font(names=REGULAR_FONTS):
+    # first candidate that covers COVERAGE, else the first one that loads
+    if names in _chosen:
+        return _chosen[names]
+    fallback = None
+    for d in _font_dirs():
+        for name in names:
+            path = os.path.join(d, name)
+            if not os.path.isfile(path):
+                continue
+            try:
+                font, _ = _font_metrics(path)
+            except Exception as e:
+                trace.record_error('pdf.font', e, path=path)
+                continue
+            if _covers(font, COVERAGE):
+                _chosen[names] = path
+                return path
+            fallback = fallback or path
+    _chosen[names] = fallback
+    return fallback
+
+class _Subset:
+    # FPDF appends every character it draws to a list it later searches with
+    # `in`; a set keeps each code point once and makes both O(1)
+    def __init__(self, items=()):
+        self._codes = set(items)
+        self.append = self._codes.add
+
+    def __contains__(self, uni):
+        return uni in self._codes
+
+    def __iter__(self):
+        return iter(sorted(self._codes))
+
+    def __len__(self):
+        return len(self._codes)
+
+    def __delitem__(self, index):
+        # _putfonts drops the placeholder code 0 FPDF seeds every subset with
+        # (`del subset[0]`); no other code may go, or it maps to .notdef
+        if index != 0:
+            raise IndexError(index)
+        self._codes.discard(0)
+
+class _CachedSubsetter(TTFontFile):
+    # stands in for TTFontFile inside FPDF._putfonts
+    def makeSubset(self, file, subset):
+        key = (_source_key(file), tuple(sorted(subset)))
+        hit = _subsets.get(key)
+        if hit is None:
+            with trace.span('pdf.subset', glyphs=len(subset)):
+                stream = TTFontFile.makeSubset(self, file, subset)
+            hit = (stream, self.codeToGlyph, self.maxUni)
+            if len(_subsets) >= SUBSET_CACHE:
+                del _subsets[next(iter(_subsets))]
+            _subsets[key] = hit
+        stream, self.codeToGlyph, self.maxUni = hit
+        return stream
+
+# -----------------------
+# Streaming FPDF
+# -----------------------
+class _FileSink:
+    # replaces FPDF's string buffer: `buffer += s` goes to the file and
+    # len(buffer) is the byte offset FPDF records for the xref table
+    def __init__(self, f):
+        self.f = f
+        self.size = 0
+
+    def __iadd__(self, s):
+        data = s.encode('latin1')
+        self.f.write(data)
+        self.size += len(data)
+        return self
+
+    def __len__(self):
+        return self.size
+
+class StreamingPDF(FPDF):
+    def __init__(self, spool_dir=None):
+        FPDF.__init__(self, 'P', 'mm', 'A4')
+        self._spool = tempfile.TemporaryFile(dir=spool_dir)
+        self._page_spans = []     # (offset, length) of each compressed page
+        self._image_keys = {}     # source key -> FPDF image name
+        self._word_w = {}         # (font, word) -> width in font units
+
+    def _spool_write(self, data):
+        self._spool.seek(0, os.SEEK_END)
+        offset = self._spool.tell()
+        self._spool.write(data)
+        return offset, len(data)
+
+    def _spool_read(self, span):
+        self._spool.seek(span[0])
+        return self._spool.read(span[1])
+
+    def use_font(self, family, style, path):
+        font, files = _font_metrics(path)
+        key = family.lower() + style.upper()
+        self.fonts[key] = dict(font, i=len(self.fonts) + 1, fontkey=key, subset=_Subset([0] + BASE_CHARS))
+        self.font_files[key] = dict(files)
+        self.font_files[str(path)] = {'type': 'TTF'}
+
+    def paragraph(self, h, text):
+        # multi_cell() measures every character with its own get_string_width()
+        # call; here each word is measured once and every line is one cell()
+        cw = self.current_font['cw']
+        fontkey = self.current_font['fontkey']
+        widths = self._word_w
+        scale = self.font_size / 1000.0
+        wmax = self.w - self.l_margin - self.r_margin - 2 * self.c_margin
+        space = cw[32] * scale
+        line, line_w = [], 0.0
+        for word in text.split(' '):
+            units = widths.get((fontkey, word))
+            if units is None:
+                units = widths[(fontkey, word)] = sum(cw[ord(c)] for c in word)
+            ww = units * scale
+            if line and line_w + space + ww > wmax:
+                self.cell(0, h, ' '.join(line), ln=1)
+                line, line_w = [], 0.0
+            while ww > wmax:
+                # a single word wider than the page is broken anywhere
+                cut, cut_w = 0, 0.0
+                while cut < len(word) - 1 and cut_w + cw[ord(word[cut])] * scale <= wmax:
+                    cut_w += cw[ord(word[cut])] * scale
+                    cut += 1
+                self.cell(0, h, word[:max(cut, 1)], ln=1)
+                word = word[max(cut, 1):]
+                ww = sum(cw[ord(c)] for c in word) * scale
+            line_w += ww + (space if line else 0.0)
+            line.append(word)
+        self.cell(0, h, ' '.join(line), ln=1)
+
+    def place_image(self, path, w, max_h, dpi=MEDIA_DPI):
+        # picture pre-sized to w mm at dpi; repeated pictures are stored once
+        key = _source_key(path)
+        name = self._image_keys.get(key)
+        if name is None:
+            with trace.span('resample', path=str(path)):
+                info = _image_info(path, w / MM_PER_INCH, dpi)
+            info['spool'] = self._spool_write(info.pop('data'))
+            info['i'] = len(self.images) + 1
+            name = self._image_keys[key] = f"img{info['i']}"
+            self.images[name] = info
+        info = self.images[name]
+        h = w * info['h'] / info['w']
+        if h > max_h:
+            w, h = w * max_h / h, max_h
+        self.image(name, x=self.l_margin + (self.w - self.l_margin - self.r_margin - w) / 2, w=w, h=h)
+
+    def _endpage(self):
+        # the page is complete: compress it into the spool and drop the string
+        page = self.pages[self.page]
+        self._page_spans.append(self._spool_write(zlib.compress(page.encode('latin1'))))
+        self.pages[self.page] = ''
+        FPDF._endpage(self)
+
+    def _putpages(self):
+        nb = len(self._page_spans)
+        for span in self._page_spans:
+            self._newobj()
+            self._out('<</Type /Page /Parent 1 0 R /Resources 2 0 R')
+            self._out('/Contents %d 0 R>>' % (self.n + 1))
+            self._out('endobj')
+            data = self._spool_read(span)
+            self._newobj()
+            self._out('<</Filter /FlateDecode /Length %d>>' % len(data))
+            self._putstream(data)
+            self._out('endobj')
+        self.offsets[1] = len(self.buffer)
+        self._out('1 0 obj')
+        self._out('<</Type /Pages')
+        self._out('/Kids [' + ' '.join('%d 0 R' % (3 + 2 * i) for i in range(nb)) + ']')
+        self._out('/Count %d' % nb)
+        self._out('/MediaBox [0 0 %.2f %.2f]' % (self.fw_pt, self.fh_pt))
+        self._out('>>')
+        self._out('endobj')
+
+    def _putfonts(self):
+        # FPDF re-parses the whole TTF for every subset it builds
+        with _lock:
+            fpdf_module.TTFontFile = _CachedSubsetter
+            try:
+                FPDF._putfonts(self)
+            finally:
+                fpdf_module.TTFontFile = TTFontFile
+
+    def _putimages(self):
+        for info in sorted(self.images.values(), key=lambda i: i['i']):
+            info['data'] = self._spool_read(info['spool'])
+            self._putimage(info)
+            del info['data']
+
+    def save(self, out_path):
+        out_path = Path(out_path)
+        tmp = out_path.with_name(out_path.name + '.tmp')
+        try:
+            with open(tmp, 'wb') as f:
+                head, self.buffer = self.buffer, _FileSink(f)
+                if head:
+                    self.buffer += head
+                self.close()
+        except BaseException:
+            if tmp.exists():
+                tmp.unlink()  # no half-written file left next to the output
+            raise
+        finally:
+            self._spool.close()
+        os.replace(tmp, out_path)
+        return out_path
+
+def _image_info(path, width_in, dpi):
+    # FPDF image dict: JPEG passes through as DCTDecode, anything else is
+    # flattened onto the white page and deflated
+    data, ext, (w, h) = load_media(path, width_in, dpi)
+    with Image.open(BytesIO(data)) as img:
+        if ext == 'jpeg':
+            cs = {'L': 'DeviceGray', 'CMYK': 'DeviceCMYK'}.get(img.mode, 'DeviceRGB')
+            return {'w': w, 'h': h, 'cs': cs, 'bpc': 8, 'f': 'DCTDecode', 'data': data}
+        if img.mode in ('RGBA', 'LA', 'PA') or 'transparency' in img.info:
+            rgba = img.convert('RGBA')
+            flat = Image.new('RGB', rgba.size, (255, 255, 255))
+            flat.paste(rgba, mask=rgba.getchannel('A'))
+        else:
+            flat = img.convert('RGB')
+        return {'w': w, 'h': h, 'cs': 'DeviceRGB', 'bpc': 8, 'f': 'FlateDecode',
+                'data': zlib.compress(flat.tobytes())}
+
+def _pdf_text(text):
+    return _NON_BMP.sub('?', _CONTROL.sub('', text.replace('\t', '    ')))
+
+# -----------------------
+# Export
+# -----------------------
+def document_to_pdf(buffer, title, out_path, dpi=MEDIA_DPI):
+    out_path = Path(out_path)
+    regular = find_font(REGULAR_FONTS)
+    if regular is None:
+        raise RuntimeError("PDF uchun shrift topilmadi (DejaVuSans.ttf)")
+    bold = find_font(BOLD_FONTS)
+    pdf = StreamingPDF(spool_dir=out_path.parent)
+    pdf.set_margins(MARGIN, MARGIN, MARGIN)
+    pdf.set_auto_page_break(True, MARGIN)
+    pdf.use_font('body', '', regular)
+    if bold:
+        pdf.use_font('body', 'B', bold)
+    pdf.add_page()
+    image_w = min(IMAGE_WIDTH_IN * MM_PER_INCH, pdf.w - 2 * MARGIN)
+    max_h = pdf.h - 2 * MARGIN
+    with trace.span('layout', blocks=len(buffer)) as attrs:
+        if title:
+            pdf.set_font('body', 'B' if bold else '', TITLE_SIZE)
+            pdf.paragraph(TITLE_H, _pdf_text(title))
+            pdf.ln(LINE_H / 2)
+        pdf.set_font('body', '', BODY_SIZE)
+        for block in buffer.blocks:
+            if block.image is None:
+                text = _pdf_text(block.text.strip())
+                if text:
+                    pdf.paragraph(LINE_H, text)
+                else:
+                    pdf.ln(LINE_H)
+                continue
+            if not os.path.exists(block.image):
+                pdf.paragraph(LINE_H, "[Rasm topilmadi]")
+                continue
+            try:
+                pdf.place_image(block.image, image_w, max_h, dpi)
+            except Exception as e:
+                trace.record_error('pdf.image', e, path=block.image)
+                pdf.paragraph(LINE_H, "[Rasm qo'shishda xatolik]")
+        attrs['pages'] = pdf.page_no()
+    with trace.span('write', pages=pdf.page_no()):
+        pdf.save(out_path)
+    return out_path
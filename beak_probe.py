@@ -0,0 +1,153 @@
+# beak_probe.py
+# Beak AI — probing and prefetching of chosen files (no Kivy imports)
+# As soon as the file chooser returns, every file is probed on a small worker
+# pool from its header only (format, dimensions, EXIF orientation, sheet
+# dimensions), so a broken or unsupported file is flagged before any export
+# runs. Work the next action will need (decoding pages, reading a workbook) is
+# started on the same pool right behind the probes; the action later takes the
+# finished result instead of doing it again on the UI thread.
+import os
+import re
+import zipfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+from openpyxl.utils.cell import range_boundaries
+
+import beak_trace as trace
+
+WORKERS = min(4, os.cpu_count() or 1)
+IMAGE_FORMATS = {'JPEG', 'MPO', 'PNG', 'WEBP', 'BMP', 'GIF', 'TIFF'}
+SHEET_HEAD = 4096  # bytes of a worksheet read to find its <dimension>
+
+_DIMENSION = re.compile(rb'<(?:\w+:)?dimension ref="([A-Z]+\d+(?::[A-Z]+\d+)?)"')
+_SHEET = re.compile(r"xl/worksheets/sheet(\d+)\.xml")
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(WORKERS, thread_name_prefix='probe')
+        return _pool
+
+# -----------------------
+# Header-only probes
+# -----------------------
+def _probe_image(path):
+    # Image.open parses the header; no pixel data is decoded
+    with Image.open(path) as img:
+        if img.format not in IMAGE_FORMATS:
+            raise ValueError(f"Qo'llanmaydigan format: {img.format}")
+        orientation = img.getexif().get(0x0112, 1)
+        w, h = img.size
+        if orientation in (5, 6, 7, 8):
+            w, h = h, w  # as displayed
+        return {'format': img.format.lower(), 'width': w, 'height': h,
+                'orientation': orientation, 'mode': img.mode}
+
+def _probe_xlsx(path):
+    with zipfile.ZipFile(path) as zf:
+        names = zf.namelist()
+        if 'xl/workbook.xml' not in names:
+            raise ValueError("Excel fayli emas")
+        sheets = sorted((int(m.group(1)), n) for n in names for m in [_SHEET.fullmatch(n)] if m)
+        info = {'format': 'xlsx', 'sheets': len(sheets), 'dimension': None, 'rows': None, 'cols': None}
+        if sheets:
+            with zf.open(sheets[0][1]) as f:
+                m = _DIMENSION.search(f.read(SHEET_HEAD))
+            if m:
+                ref = m.group(1).decode('ascii')
+                min_col, min_row, max_col, max_row = range_boundaries(ref if ':' in ref else f"{ref}:{ref}")
+                info.update(dimension=ref, rows=max_row, cols=max_col)
+        return info
+
+PROBES = {
+    'image': _probe_image,
+    'xlsx': _probe_xlsx,
+}
+
+def probe(path, kind):
+    # {'path', 'kind', 'ok', 'error', 'bytes', ...format specific}; never raises
+    info = {'path': str(path), 'kind': kind, 'ok': True, 'error': None}
+    try:
+        with trace.span('probe', kind=kind):
+            info['bytes'] = os.path.getsize(path)
+            info.update(PROBES[kind](path))
+    except Exception as e:  # the span has recorded it
+        info.update(ok=False, error=str(e) or type(e).__name__)
+    return info
+
+def _prefetch(probe_future, fn, path, kind):
+    # queued after every probe of the selection, so waiting here never
+    # blocks a worker behind work that has not started
+    info = probe_future.result()
+    if not info['ok']:
+        raise ValueError(info['error'])
+    with trace.span('prefetch', kind=kind):
+        return fn(path)
+
+# -----------------------
+# Selection
+# -----------------------
+class Selection:
+    # the files returned by one chooser call, with their probes and the
+    # prefetched results of fn(path) for the first `limit` of them
+    def __init__(self, paths, kind, prefetch=None, limit=None):
+        self.paths = [str(p) for p in paths]
+        self.kind = kind
+        ex = pool()
+        self._probes = {p: ex.submit(probe, p, kind) for p in self.paths}
+        self._work = {}
+        if prefetch is not None:
+            for p in self.paths[:limit]:
+                self._work[p] = ex.submit(_prefetch, self._probes[p], prefetch, p, kind)
+
+    def when_probed(self, callback):
+        # callback(selection, [probe dicts]) on a worker thread once all are in
+        pending = [len(self._probes)]
+        lock = threading.Lock()
+        def _done(_):
+            with lock:
+                pending[0] -= 1
+                last = pending[0] == 0
+            if last:
+                callback(self, [self._probes[p].result() for p in self.paths])
+        for f in self._probes.values():
+            f.add_done_callback(_done)
+
+    def when_done(self, path, callback):
+        # callback(result, error) on a worker thread once path's prefetch ends
+        def _done(f):
+            try:
+                callback(f.result(), None)
+            except Exception as e:
+                callback(None, e)
+        self._work[str(path)].add_done_callback(_done)
+
+    def info(self, path):
+        f = self._probes.get(str(path))
+        return f.result() if f is not None and f.done() else None
+
+    def ok(self, path):
+        # unknown (still probing or not part of the selection) counts as ok
+        info = self.info(path)
+        return info is None or info['ok']
+
+    def result(self, path, fallback):
+        # the prefetched result (handed over once), else fallback(path)
+        f = self._work.pop(str(path), None)
+        if f is not None and not f.cancelled():
+            try:
+                return f.result()
+            except Exception:
+                pass  # fallback reports the error with its own context
+        return fallback(path)
+
+    def cancel(self):
+        for f in self._work.values():
+            f.cancel()
+        self._work.clear()
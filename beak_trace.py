@@ -0,0 +1,226 @@
+# beak_trace.py
+# Beak AI — lightweight tracing spans (no Kivy imports)
+# Spans are kept in a bounded in-memory ring buffer and, when a flush path is
+# configured, appended to a JSON-lines file by a background writer thread; the
+# file is rotated to <name>.1 once it passes MAX_FILE_BYTES. An operation can
+# also be wrapped in a one-shot cProfile capture (arm_profile() + operation()).
+import io
+import os
+import math
+import json
+import time
+import pstats
+import cProfile
+import threading
+from pathlib import Path
+from collections import deque
+from contextlib import contextmanager
+
+RING_SIZE = 2000
+FLUSH_EVERY = 50
+MAX_FILE_BYTES = 4 * 2**20  # per file; with one rotated copy at most ~2x on disk
+
+_lock = threading.Lock()
+_local = threading.local()
+_spans = deque(maxlen=RING_SIZE)
+_pending = []
+_flush_path = None
+_profile_dir = None
+_profile_armed = False
+_write_lock = threading.Lock()   # keeps batches in order in the file
+_due = threading.Event()
+_writer = None
+
+def configure(flush_path=None, profile_dir=None, ring_size=None):
+    # flush_path=None turns JSON-lines output off; spans stay in memory only
+    global _flush_path, _profile_dir, _spans
+    with _lock:
+        _flush_path = Path(flush_path) if flush_path else None
+        if profile_dir is not None:
+            _profile_dir = Path(profile_dir)
+        if ring_size and ring_size != _spans.maxlen:
+            _spans = deque(_spans, maxlen=ring_size)
+        if _flush_path is None:
+            _pending.clear()
+        else:
+            _start_writer()
+
+def _start_writer():
+    # called with _lock held
+    global _writer
+    if _writer is None:
+        _writer = threading.Thread(target=_write_loop, name='trace-flush', daemon=True)
+        _writer.start()
+
+def _write_loop():
+    while True:
+        _due.wait()
+        _due.clear()
+        try:
+            flush()
+        except OSError:
+            pass  # storage gone or full: that batch is lost, the ring keeps it
+
+def flush_path():
+    return _flush_path
+
+def _stack():
+    st = getattr(_local, 'stack', None)
+    if st is None:
+        st = _local.stack = []
+    return st
+
+def _record(entry):
+    with _lock:
+        _spans.append(entry)
+        if _flush_path is not None:
+            _pending.append(entry)
+            due = len(_pending) >= FLUSH_EVERY
+        else:
+            due = False
+    if due:
+        _due.set()  # written by the trace-flush thread, never the recording one
+
+def start(name, **attrs):
+    # for spans that do not fit a with-block (e.g. waiting on a callback)
+    return {'name': name, 'attrs': attrs, 't0': time.perf_counter(), 'ts': time.time()}
+
+def finish(token, error=None, **attrs):
+    token['attrs'].update(attrs)
+    entry = {
+        'name': token['name'],
+        'ts': token['ts'],
+        'dur_ms': (time.perf_counter() - token['t0']) * 1000.0,
+        'parent': token.get('parent'),
+        'thread': threading.current_thread().name,
+    }
+    if token['attrs']:
+        entry['attrs'] = token['attrs']
+    if error is not None:
+        entry['error'] = error if isinstance(error, str) else f"{type(error).__name__}: {error}"
+    _record(entry)
+    return entry
+
+@contextmanager
+def span(name, **attrs):
+    st = _stack()
+    token = start(name, **attrs)
+    token['parent'] = st[-1] if st else None
+    st.append(name)
+    error = None
+    try:
+        yield token['attrs']
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        st.pop()
+        finish(token, error=error)
+
+def record_error(name, exc, **attrs):
+    # failures that are handled and skipped still show up in diagnostics
+    token = start(name, **attrs)
+    st = _stack()
+    token['parent'] = st[-1] if st else None
+    return finish(token, error=exc)
+
+# -----------------------
+# Reading back
+# -----------------------
+def recent(limit=100):
+    with _lock:
+        items = list(_spans)
+    return items[-limit:][::-1]
+
+def _percentile(sorted_vals, pct):
+    # nearest-rank percentile of an already sorted list
+    if not sorted_vals:
+        return 0.0
+    k = max(0, min(len(sorted_vals) - 1, math.ceil(pct / 100.0 * len(sorted_vals)) - 1))
+    return sorted_vals[k]
+
+def stage_stats():
+    # {name: {'count', 'errors', 'p50', 'p90', 'p99', 'max'}} over the ring buffer
+    with _lock:
+        items = list(_spans)
+    by_name = {}
+    for e in items:
+        by_name.setdefault(e['name'], []).append(e)
+    stats = {}
+    for name, entries in by_name.items():
+        durs = sorted(e['dur_ms'] for e in entries)
+        stats[name] = {
+            'count': len(durs),
+            'errors': sum(1 for e in entries if 'error' in e),
+            'p50': _percentile(durs, 50),
+            'p90': _percentile(durs, 90),
+            'p99': _percentile(durs, 99),
+            'max': durs[-1],
+        }
+    return stats
+
+def _rotate(path):
+    try:
+        if path.stat().st_size >= MAX_FILE_BYTES:
+            os.replace(path, path.with_name(path.name + '.1'))
+    except FileNotFoundError:
+        pass
+
+def flush():
+    # synchronous; the app calls it on stop, the writer thread in between
+    with _write_lock:
+        with _lock:
+            path = _flush_path
+            batch = _pending[:]
+            _pending.clear()
+        if path is None or not batch:
+            return 0
+        _rotate(path)
+        with open(path, 'a', encoding='utf-8') as f:
+            for e in batch:
+                f.write(json.dumps(e, ensure_ascii=False, default=str) + "\n")
+        return len(batch)
+
+def clear():
+    with _lock:
+        _spans.clear()
+        _pending.clear()
+
+# -----------------------
+# One-shot profiling
+# -----------------------
+def arm_profile():
+    # the next operation() runs under cProfile
+    global _profile_armed
+    _profile_armed = True
+
+def profile_armed():
+    return _profile_armed
+
+@contextmanager
+def operation(name, **attrs):
+    # top-level user action: a span, plus a cProfile capture if armed
+    global _profile_armed
+    prof = None
+    if _profile_armed:
+        _profile_armed = False
+        prof = cProfile.Profile()
+    with span(name, **attrs) as a:
+        if prof is None:
+            yield a
+            return
+        prof.enable()
+        try:
+            yield a
+        finally:
+            prof.disable()
+            a['profile'] = str(_write_profile(name, prof))
+
+def _write_profile(name, prof):
+    out_dir = _profile_dir or Path('.')
+    path = out_dir / f"profile_{name}_{time.strftime('%Y%m%d_%H%M%S')}.txt"
+    buf = io.StringIO()
+    pstats.Stats(prof, stream=buf).sort_stats('cumulative').print_stats(60)
+    path.write_text(buf.getvalue(), encoding='utf-8')
+    prof.dump_stats(str(path.with_suffix('.prof')))
+    return path
@@ -0,0 +1,350 @@
+# bench_export.py
+# Beak AI — headless benchmarks for every export path in beak_engine.
+# Each case builds synthetic input once, then records wall time, CPU time and
+# peak RSS growth over a few untraced repeats, plus the tracemalloc peak of one
+# extra traced run (tracemalloc slows allocation-heavy cases several times over
+# and does not see Pillow's pixel buffers, hence both). Results go to JSON and
+# are compared against benchmarks/baseline.json:
+#   python benchmarks/bench_export.py                       # standard profile
+#   python benchmarks/bench_export.py --profile full -o results.json
+#   python benchmarks/bench_export.py --update-baseline     # after an intended change
+#   python benchmarks/bench_export.py --baseline none       # no comparison
+# Exit status is 1 when any case regresses beyond --threshold, or when none of
+# the cases run is in the baseline (nothing was compared).
+import os
+import sys
+import json
+import time
+import random
+import ctypes
+import platform
+import argparse
+import tempfile
+import threading
+import tracemalloc
+from pathlib import Path
+from statistics import median
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from PIL import Image, ImageDraw
+
+import beak_engine as engine
+from beak_docx import DocxWriter
+from beak_document import DocumentBuffer
+
+# case name -> size parameter, per profile
+PROFILES = {
+    'quick': {
+        'create_pdf': [1, 10],
+        'save_docx': [200],
+        'photo_docx': [4],
+        'word_pdf': [200],
+        'resave_docx': [200],
+        'export_pdf': [5],
+        'export_pptx': [5],
+        'save_xlsx': [1000],
+        'load_xlsx': [1000],
+    },
+    'standard': {
+        'create_pdf': [1, 100],
+        'save_docx': [5000],
+        'photo_docx': [20],
+        'word_pdf': [3000],
+        'resave_docx': [5000],
+        'export_pdf': [50],
+        'export_pptx': [50],
+        'save_xlsx': [20000],
+        'load_xlsx': [20000],
+    },
+    'full': {
+        'create_pdf': [1, 100, 1000],
+        'save_docx': [5000, 50000],
+        'photo_docx': [20, 100],
+        'word_pdf': [3000, 20000],
+        'resave_docx': [5000, 50000],
+        'export_pdf': [50],
+        'export_pptx': [50],
+        'save_xlsx': [20000, 100000],
+        'load_xlsx': [20000, 100000],
+    },
+}
+
+BASELINE = Path(__file__).resolve().parent / "baseline.json"
+RSS_INTERVAL = 0.005   # seconds between RSS samples
+# growth below these never counts as a regression (timer, allocator and page noise)
+SLACK = {'wall_s': 0.02, 'cpu_s': 0.02, 'peak_bytes': 256 * 2**10, 'rss_peak_bytes': 4 * 2**20}
+
+SHEET_COLS = 10
+PHOTO_SIZE = (4032, 3024)
+WORDS = "beak ai hujjat matn slayd jadval rasm sahifa kelajak qadam office mobile".split()
+
+# -----------------------
+# Synthetic inputs
+# -----------------------
+def make_images(workdir, count, size=(1600, 1200)):
+    # a few distinct photos-like images, repeated under different names
+    rnd = random.Random(count)
+    paths = []
+    for i in range(count):
+        p = workdir / f"img_{i:04d}.jpg"
+        img = Image.new('RGB', size, (rnd.randrange(256), rnd.randrange(256), rnd.randrange(256)))
+        draw = ImageDraw.Draw(img)
+        for _ in range(20):
+            x, y = rnd.randrange(size[0]), rnd.randrange(size[1])
+            draw.ellipse((x, y, x + 200, y + 150), fill=(rnd.randrange(256), rnd.randrange(256), rnd.randrange(256)))
+        img.save(p, quality=90)
+        paths.append(str(p))
+    return paths
+
+def make_text(paragraphs, images=()):
+    rnd = random.Random(paragraphs)
+    lines = []
+    for i in range(paragraphs):
+        lines.append(" ".join(rnd.choice(WORDS) for _ in range(rnd.randint(20, 80))))
+        if images and i % 100 == 50:
+            lines.append(f"[IMAGE:{images[(i // 100) % len(images)]}]")
+    return "\n".join(lines)
+
+def make_slides(count, images):
+    slides = []
+    for i in range(count):
+        s = engine.new_slide()
+        s['title'] = f"Slayd {i + 1}"
+        s['text'] = make_text(3)
+        s['images'] = images[i % len(images):i % len(images) + 1]
+        s['bg_color'] = '#%02x%02x%02x' % (255 - i % 64, 255, 240)
+        slides.append(s)
+    return slides
+
+def make_cells(count):
+    rows = max(1, count // SHEET_COLS)
+    values = {}
+    for r in range(1, rows + 1):
+        for c in range(SHEET_COLS - 1):
+            values[f"{chr(65 + c)}{r}"] = str(r * c)
+        values[f"{chr(64 + SHEET_COLS)}{r}"] = f"=SUM(A{r}:{chr(63 + SHEET_COLS)}{r})"
+    return values
+
+# -----------------------
+# Cases: setup(workdir, n) -> callable(out_dir)
+# -----------------------
+def setup_create_pdf(workdir, n):
+    paths = make_images(workdir, n)
+    return lambda out: engine.images_to_pdf(paths, out / "images.pdf")
+
+def setup_save_docx(workdir, n):
+    text = make_text(n, make_images(workdir, 5))
+    return lambda out: engine.text_to_docx("Benchmark", text, out / "doc.docx")
+
+def setup_photo_docx(workdir, n):
+    # phone-camera sized photos, each inserted twice
+    photos = make_images(workdir, n, size=PHOTO_SIZE)
+    text = "\n".join(f"Rasm {i}\n[IMAGE:{p}]" for i, p in enumerate(photos + photos))
+    return lambda out: engine.text_to_docx("Benchmark", text, out / "photos.docx")
+
+def setup_word_pdf(workdir, n):
+    text = make_text(n, make_images(workdir, 5))
+    return lambda out: engine.text_to_pdf("Benchmark", text, out / "doc.pdf")
+
+def setup_resave_docx(workdir, n):
+    # one-word edit in the middle of an already saved document
+    buf = DocumentBuffer(make_text(n, make_images(workdir, 5)))
+    writer = DocxWriter()
+    writer.save(buf, "Benchmark", workdir / "doc.docx")
+    mid = len(buf) // 2
+    def run(out):
+        buf.replace(mid, buf[mid] + " x")
+        writer.save(buf, "Benchmark", workdir / "doc.docx")
+    return run
+
+def setup_export_pdf(workdir, n):
+    slides = make_slides(n, make_images(workdir, 5))
+    return lambda out: engine.slides_to_pdf(slides, out / "slides.pdf")
+
+def setup_export_pptx(workdir, n):
+    slides = make_slides(n, make_images(workdir, 5))
+    return lambda out: engine.slides_to_pptx(slides, out / "slides.pptx")
+
+def setup_save_xlsx(workdir, n):
+    values = make_cells(n)
+    return lambda out: engine.cells_to_xlsx(values, out / "sheet.xlsx")
+
+def setup_load_xlsx(workdir, n):
+    path = workdir / "input.xlsx"
+    engine.cells_to_xlsx(make_cells(n), path)
+    rows = max(1, n // SHEET_COLS)
+    return lambda out: engine.read_xlsx(path, rows=rows, cols=SHEET_COLS)
+
+CASES = {
+    'create_pdf': setup_create_pdf,
+    'save_docx': setup_save_docx,
+    'photo_docx': setup_photo_docx,
+    'word_pdf': setup_word_pdf,
+    'resave_docx': setup_resave_docx,
+    'export_pdf': setup_export_pdf,
+    'export_pptx': setup_export_pptx,
+    'save_xlsx': setup_save_xlsx,
+    'load_xlsx': setup_load_xlsx,
+}
+
+# -----------------------
+# Runner
+# -----------------------
+def _rss():
+    # resident set size in bytes (Linux/Android), None elsewhere
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def _trim_heap():
+    # hand freed memory back to the OS so an earlier case's pages do not hide
+    # this one's growth (glibc only; a no-op elsewhere)
+    try:
+        ctypes.CDLL(None).malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+class RssPeak:
+    # peak RSS growth over a with-block, sampled from a background thread
+    def __enter__(self):
+        _trim_heap()
+        self.start = self.peak = _rss()
+        self._stop = threading.Event()
+        if self.start is not None:
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        return self
+
+    def _sample(self):
+        while not self._stop.wait(RSS_INTERVAL):
+            self.peak = max(self.peak, _rss())
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self.start is not None:
+            self._thread.join()
+            self.peak = max(self.peak, _rss())
+
+    @property
+    def growth(self):
+        return None if self.start is None else self.peak - self.start
+
+def measure(fn, out_dir, repeats):
+    walls, cpus, rss = [], [], []
+    out_bytes = None
+    for _ in range(repeats):
+        with RssPeak() as peak:
+            w0, c0 = time.perf_counter(), time.process_time()
+            result = fn(out_dir)
+            walls.append(time.perf_counter() - w0)
+            cpus.append(time.process_time() - c0)
+        rss.append(peak.growth)
+        if isinstance(result, (str, Path)) and Path(result).is_file():
+            out_bytes = Path(result).stat().st_size
+    # Python allocations are counted in one separate run; its time is not used
+    tracemalloc.start()
+    try:
+        fn(out_dir)
+        traced_peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    r = {'wall_s': median(walls), 'cpu_s': median(cpus), 'peak_bytes': traced_peak, 'repeats': repeats}
+    if rss[0] is not None:
+        r['rss_peak_bytes'] = max(rss)
+    if out_bytes is not None:
+        r['out_bytes'] = out_bytes
+    return r
+
+def run(profile, repeats, only=None, log=print):
+    results = {}
+    for case, sizes in PROFILES[profile].items():
+        if only and case not in only:
+            continue
+        for n in sizes:
+            key = f"{case}[{n}]"
+            with tempfile.TemporaryDirectory(prefix="beak_bench_") as tmp:
+                workdir = Path(tmp)
+                fn = CASES[case](workdir, n)
+                results[key] = measure(fn, workdir, repeats)
+            r = results[key]
+            size = f"  out {r['out_bytes'] / 2**20:8.2f} MiB" if 'out_bytes' in r else ""
+            rss = f"  rss +{r['rss_peak_bytes'] / 2**20:7.1f} MiB" if 'rss_peak_bytes' in r else ""
+            log(f"{key:24s} wall {r['wall_s']:8.3f}s  cpu {r['cpu_s']:8.3f}s  peak {r['peak_bytes'] / 2**20:8.1f} MiB{rss}{size}")
+    return results
+
+def compare(results, baseline, threshold):
+    # returns ([(key, metric, old, new) grown beyond threshold], cases compared)
+    regressions, matched = [], 0
+    for key, new in results.items():
+        old = baseline.get(key)
+        if not old:
+            continue
+        matched += 1
+        for metric in ('wall_s', 'cpu_s', 'peak_bytes', 'rss_peak_bytes'):
+            if not old.get(metric) or new.get(metric) is None:
+                continue
+            if new[metric] - old[metric] < SLACK.get(metric, 0):
+                continue
+            if new[metric] > old[metric] * (1 + threshold):
+                regressions.append((key, metric, old[metric], new[metric]))
+    return regressions, matched
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Beak AI export benchmarks")
+    parser.add_argument('--profile', choices=sorted(PROFILES), default='standard')
+    parser.add_argument('--case', action='append', choices=sorted(CASES), help="run only these cases")
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('-o', '--output', help="write results JSON here")
+    parser.add_argument('--baseline', default=str(BASELINE), help="baseline JSON to compare against ('none' to skip)")
+    parser.add_argument('--update-baseline', action='store_true', help="merge these results into --baseline")
+    parser.add_argument('--threshold', type=float, default=0.25, help="allowed growth before flagging (0.25 = +25%%)")
+    args = parser.parse_args(argv)
+
+    results = run(args.profile, args.repeats, args.case)
+    report = {
+        'profile': args.profile,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'results': results,
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2), encoding='utf-8')
+
+    if not args.baseline or args.baseline == 'none':
+        return 0
+    baseline_path = Path(args.baseline)
+    if args.update_baseline:
+        if baseline_path.exists():
+            # keep cases this run did not touch
+            old = json.loads(baseline_path.read_text(encoding='utf-8'))
+            old.get('results', {}).update(results)
+            report['results'] = old.get('results', results)
+        baseline_path.write_text(json.dumps(report, indent=2), encoding='utf-8')
+        print(f"Baseline updated: {baseline_path}")
+        return 0
+    if not baseline_path.exists():
+        print(f"No baseline at {baseline_path}", file=sys.stderr)
+        return 0
+    stored = json.loads(baseline_path.read_text(encoding='utf-8'))
+    if (stored.get('machine'), stored.get('cpu_count')) != (report['machine'], report['cpu_count']):
+        print(f"Note: baseline was recorded on {stored.get('machine')} with {stored.get('cpu_count')} CPUs", file=sys.stderr)
+    baseline = stored.get('results', {})
+    regressions, matched = compare(results, baseline, args.threshold)
+    if not matched:
+        print(f"No case of this run is in {baseline_path} (profile '{stored.get('profile')}');"
+              f" nothing was compared", file=sys.stderr)
+        return 1
+    if matched < len(results):
+        print(f"Compared {matched} of {len(results)} cases; the rest are not in the baseline", file=sys.stderr)
+    for key, metric, old, new in regressions:
+        print(f"REGRESSION {key} {metric}: {old:.4g} -> {new:.4g} (+{(new / old - 1) * 100:.0f}%)")
+    if not regressions:
+        print(f"No regressions beyond +{args.threshold * 100:.0f}%")
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -22,7 +22,7 @@ source.include_exts = py,png,jpg,kv,atlas
 #source.exclude_exts = spec
 
 # (list) List of directory to exclude (let empty to not exclude anything)
-#source.exclude_dirs = tests, bin, venv
+source.exclude_dirs = tests, bin, venv, benchmarks
 
 # (list) List of exclusions using pattern matching
 # Do not prefix with './'
@@ -37,7 +37,7 @@ version = 1.0
 
 # (list) Application requirements
 # comma separated e.g. requirements = sqlite3,kivy
-requirements = python3,kivy,python-docx,python-pptx,openpyxl,fpdf,pillow
+requirements = python3,kivy,sqlite3,python-docx,python-pptx,openpyxl,fpdf,pillow
 
 # (str) Custom source folders for requirements
 # Sets custom source for any requirements with recipes
@@ -0,0 +1,26 @@
+# DocumentBuffer.splice, the operation undo/redo replays
+from beak_document import DocumentBuffer
+
+def test_splice_returns_the_old_texts():
+    buf = DocumentBuffer("a\nb\nc")
+    v = buf.version
+    assert buf.splice(1, 1, ["B1", "B2"]) == ["b"]
+    assert buf.texts() == ["a", "B1", "B2", "c"]
+    assert buf.version > v
+
+def test_splice_round_trips():
+    buf = DocumentBuffer("a\nb\nc")
+    old = buf.splice(0, 2, ["x"])
+    assert buf.texts() == ["x", "c"]
+    buf.splice(0, 1, old)
+    assert buf.texts() == ["a", "b", "c"]
+
+def test_splice_inserts_with_zero_count():
+    buf = DocumentBuffer("a\nc")
+    assert buf.splice(1, 0, ["b"]) == []
+    assert buf.texts() == ["a", "b", "c"]
+
+def test_splice_keeps_at_least_one_block():
+    buf = DocumentBuffer("a\nb")
+    assert buf.splice(0, 2, []) == ["a", "b"]
+    assert len(buf) == 1 and buf.texts() == [""]
@@ -0,0 +1,94 @@
+# DocxWriter: incremental saves, media reuse and atomic writes
+import os
+import zipfile
+
+import pytest
+from PIL import Image
+
+import beak_docx
+from beak_docx import DocxWriter
+from beak_document import DocumentBuffer, image_marker
+
+def _photo(path, color, size=(400, 300)):
+    Image.new('RGB', size, color).save(path, quality=90)
+    return str(path)
+
+def _media(path):
+    with zipfile.ZipFile(path) as zf:
+        return {n: zf.read(n) for n in zf.namelist() if n.startswith('word/media/')}
+
+def _doc(*lines):
+    return DocumentBuffer("\n".join(lines))
+
+def test_unchanged_buffer_is_not_rewritten(tmp_path):
+    out = tmp_path / "doc.docx"
+    buf = _doc("salom", "dunyo")
+    writer = DocxWriter()
+    writer.save(buf, "T", out)
+    before = os.stat(out).st_mtime_ns
+    writer.save(buf, "T", out)
+    assert os.stat(out).st_mtime_ns == before
+    writer.save(buf, "Boshqa", out)  # a new title is a change
+    assert os.stat(out).st_mtime_ns != before
+
+def test_same_picture_is_embedded_once(tmp_path):
+    a = _photo(tmp_path / "a.jpg", (200, 10, 10))
+    b = tmp_path / "b.jpg"
+    b.write_bytes(open(a, 'rb').read())  # same content, other name
+    out = tmp_path / "doc.docx"
+    DocxWriter().save(_doc(image_marker(a), "x", image_marker(a), image_marker(b)), "", out)
+    assert len(_media(out)) == 1
+
+def test_media_copied_from_previous_output(tmp_path, monkeypatch):
+    a = _photo(tmp_path / "a.jpg", (10, 200, 10))
+    out = tmp_path / "doc.docx"
+    buf = _doc("bir", image_marker(a))
+    writer = DocxWriter()
+    writer.save(buf, "", out)
+    first = _media(out)
+    # a text edit must not resample the picture again
+    monkeypatch.setattr(beak_docx, 'load_media', lambda *a, **k: pytest.fail("picture re-encoded"))
+    buf.replace(0, "ikki")
+    writer.save(buf, "", out)
+    assert _media(out) == first
+
+def test_media_rebuilt_when_output_changed_on_disk(tmp_path):
+    a = _photo(tmp_path / "a.jpg", (10, 10, 200))
+    out = tmp_path / "doc.docx"
+    buf = _doc("bir", image_marker(a))
+    writer = DocxWriter()
+    writer.save(buf, "", out)
+    first = _media(out)
+    # someone else replaced the file: nothing may be copied out of it
+    with zipfile.ZipFile(out, 'w') as zf:
+        zf.writestr('word/media/image1.jpeg', b'not ours')
+    buf.replace(0, "ikki")
+    writer.save(buf, "", out)
+    assert _media(out) == first
+
+def test_removed_picture_leaves_the_package(tmp_path):
+    a = _photo(tmp_path / "a.jpg", (200, 200, 10))
+    b = _photo(tmp_path / "b.jpg", (10, 200, 200))
+    out = tmp_path / "doc.docx"
+    buf = _doc(image_marker(a), image_marker(b))
+    writer = DocxWriter()
+    writer.save(buf, "", out)
+    assert len(_media(out)) == 2
+    buf.delete(0)
+    writer.save(buf, "", out)
+    assert len(_media(out)) == 1
+
+def test_failed_save_leaves_no_tmp_and_keeps_output(tmp_path, monkeypatch):
+    out = tmp_path / "doc.docx"
+    buf = _doc("bir")
+    writer = DocxWriter()
+    writer.save(buf, "", out)
+    good = out.read_bytes()
+    def boom(*args):
+        raise OSError("disk full")
+    monkeypatch.setattr(DocxWriter, '_rels', boom)
+    buf.replace(0, "ikki")
+    with pytest.raises(OSError):
+        writer.save(buf, "", out)
+    assert not (tmp_path / "doc.docx.tmp").exists()
+    assert out.read_bytes() == good
@@ -0,0 +1,138 @@
+# History: coalescing, grouping, replay and the byte budget
+import pytest
+
+import beak_history
+from beak_history import History, op_size
+from beak_document import DocumentBuffer
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = Clock()
+    monkeypatch.setattr(beak_history.time, 'monotonic', c)
+    return c
+
+class Editor:
+    # a paragraph editor recording its edits as splices, as WordScreen does
+    def __init__(self, text="", **kw):
+        self.buf = DocumentBuffer(text)
+        self.history = History(self.apply, **kw)
+
+    def apply(self, op):
+        index, count, texts = op
+        self.buf.splice(index, count, texts)
+
+    def edit(self, index, text, key=None):
+        old = self.buf.splice(index, 1, [text])
+        self.history.record((index, 1, old), (index, 1, [text]), key=key)
+
+def _sizes(h):
+    return sum(e.size for e in h._undo) + sum(e.size for e in h._redo)
+
+def test_edits_of_one_target_coalesce_within_the_window(clock):
+    ed = Editor("a")
+    ed.edit(0, "ab", key=('p', 0))
+    clock.now += 1.0
+    ed.edit(0, "abc", key=('p', 0))
+    assert len(ed.history) == 1
+    ed.history.undo()
+    assert ed.buf.text() == "a"
+    ed.history.redo()
+    assert ed.buf.text() == "abc"
+
+def test_edits_after_the_window_are_separate(clock):
+    ed = Editor("a")
+    ed.edit(0, "ab", key=('p', 0))
+    clock.now += beak_history.COALESCE_SECONDS + 0.1
+    ed.edit(0, "abc", key=('p', 0))
+    assert len(ed.history) == 2
+    ed.history.undo()
+    assert ed.buf.text() == "ab"
+
+def test_other_keys_and_keyless_edits_do_not_coalesce(clock):
+    ed = Editor("a\nb")
+    ed.edit(0, "a1", key=('p', 0))
+    ed.edit(1, "b1", key=('p', 1))
+    ed.edit(1, "b2")
+    ed.edit(1, "b3")
+    assert len(ed.history) == 4
+
+def test_undone_entry_does_not_absorb_new_edits(clock):
+    ed = Editor("a")
+    ed.edit(0, "ab", key=('p', 0))
+    ed.history.undo()
+    ed.history.redo()
+    ed.edit(0, "abc", key=('p', 0))  # same key, same instant
+    assert len(ed.history) == 2
+    ed.history.undo()
+    assert ed.buf.text() == "ab"
+
+def test_group_is_one_entry_undone_in_reverse(clock):
+    ed = Editor("a\nb")
+    with ed.history.group('both'):
+        ed.edit(0, "A")
+        ed.edit(1, "B")
+        ed.edit(0, "AA")
+    assert len(ed.history) == 1
+    assert ed.history.undo() == 'both'
+    assert ed.buf.text() == "a\nb"
+    assert ed.history.redo() == 'both'
+    assert ed.buf.text() == "AA\nB"
+
+def test_nothing_is_recorded_while_applying(clock):
+    ed = Editor("a")
+    ed.history.apply = lambda op: (Editor.apply(ed, op), ed.edit(0, "x"))
+    ed.edit(0, "b")
+    ed.history.undo()
+    assert len(ed.history) == 0 and ed.history.can_redo
+
+def test_size_counts_both_stacks(clock):
+    ed = Editor("a\nb\nc")
+    for i, t in enumerate(["x", "y", "z"]):
+        ed.edit(i, t * 50)
+    assert ed.history.size == _sizes(ed.history)
+    ed.history.undo()
+    ed.history.undo()
+    assert ed.history.size == _sizes(ed.history)
+    ed.history.redo()
+    assert ed.history.size == _sizes(ed.history)
+    ed.edit(0, "new")  # drops the remaining redo entry
+    assert not ed.history.can_redo
+    assert ed.history.size == _sizes(ed.history)
+    ed.history.clear()
+    assert ed.history.size == 0
+
+def test_coalescing_keeps_size_in_step(clock):
+    ed = Editor("a")
+    ed.edit(0, "ab", key=1)
+    ed.edit(0, "ab" * 100, key=1)
+    (entry,) = ed.history._undo
+    assert entry.size == op_size(entry.undo) + op_size(entry.redo)
+    assert ed.history.size == entry.size
+
+def test_budget_evicts_oldest_and_keeps_newest(clock):
+    ed = Editor("a\nb\nc\nd")
+    ed.edit(0, "x" * 200)
+    one = ed.history.size
+    ed.history.set_budget(2 * one + 1)
+    for i in range(1, 4):
+        ed.edit(i, "x" * 200)
+    assert len(ed.history) == 2
+    assert ed.history.size <= ed.history.budget
+    ed.history.undo()
+    ed.history.undo()
+    assert ed.buf.texts(2) == ["c", "d"]
+    assert not ed.history.can_undo  # the first two edits were evicted
+    ed.history.redo()
+    ed.history.redo()
+    ed.history.set_budget(1)  # smaller than any entry
+    assert len(ed.history) == 1
+    assert ed.history.size == _sizes(ed.history)
+    ed.history.undo()
+    assert ed.buf[3] == "d"